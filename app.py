@@ -1,13 +1,33 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import datetime
 from PIL import Image
 import base64
 from io import BytesIO
-import random
+
+from data.contacts import with_contact_info
+from data.features import FEATURES
+from data.mock_data import (ACCOUNT_MANAGERS, count_opportunities, generate_merchant_segments,
+                            generate_opportunity_recommendations)
+from data.snapshot import load_or_generate_dataset, snapshot_key
+from utils.assignment import assign_opportunities
+from utils.export import MAX_DOWNLOAD_MERCHANTS, opportunities_csv
+from utils.cache import RESULT_CACHE, memoize
+from utils.cards import merchant_cards, opportunity_cards, top_performer_cards
+from utils.neighbors import SimilarMerchantIndex
+from utils.opportunity_index import OpportunityIndex
+from utils.profiles import low_adopters, segment_profile, success_profiles
+from utils.recipes import feature_recipes
+from utils.simulation import simulate_revenue_uplift
+
+# Opportunity Generator paging: merchants per page and how deep the ranking can be browsed
+OPPORTUNITIES_PER_PAGE = 10
+MAX_RANKED_OPPORTUNITIES = 500
+
+# Seconds the shared dataset (and everything cached from it) is kept before being reloaded
+DATASET_TTL = 3600
 
 # Set page configuration
 st.set_page_config(
@@ -311,304 +331,9 @@ def local_css():
     </style>
     """, unsafe_allow_html=True)
 
-# Generate mock data for merchant segments
-def generate_merchant_segments():
-    segments = [
-        {
-            "id": "high_growth_smb",
-            "name": "High-Growth SMB E-commerce",
-            "description": "Small to medium e-commerce businesses experiencing rapid growth",
-            "avg_monthly_volume": 42000,
-            "avg_growth_rate": 0.35,  # 35% growth
-            "avg_transaction_size": 85,
-            "merchant_count": 215,
-            "industries": {
-                "Fashion": 0.32,
-                "Electronics": 0.18,
-                "Home Goods": 0.15,
-                "Beauty": 0.12,
-                "Other": 0.23
-            },
-            "feature_adoption": {
-                "One-Click Payment": 0.75,
-                "Subscription API": 0.45,
-                "Advanced Fraud Tools": 0.68,
-                "Mobile SDK": 0.82,
-                "Embedded Checkout": 0.62
-            },
-            "success_metrics": {
-                "retention_rate": 0.92,
-                "feature_adoption_rate": 0.78,
-                "avg_volume_growth": 0.35
-            },
-            "color": "cyan"
-        },
-        {
-            "id": "established_retail",
-            "name": "Established Retail",
-            "description": "Traditional retail businesses with stable payment volumes",
-            "avg_monthly_volume": 186000,
-            "avg_growth_rate": 0.08,  # 8% growth
-            "avg_transaction_size": 125,
-            "merchant_count": 148,
-            "industries": {
-                "Department Stores": 0.38,
-                "Specialty Retail": 0.25,
-                "Grocery": 0.15,
-                "Home Improvement": 0.12,
-                "Other": 0.10
-            },
-            "feature_adoption": {
-                "One-Click Payment": 0.48,
-                "Subscription API": 0.22,
-                "Advanced Fraud Tools": 0.75,
-                "Mobile SDK": 0.35,
-                "Embedded Checkout": 0.42
-            },
-            "success_metrics": {
-                "retention_rate": 0.88,
-                "feature_adoption_rate": 0.52,
-                "avg_volume_growth": 0.08
-            },
-            "color": "green"
-        },
-        {
-            "id": "platform_fintech",
-            "name": "Platform Fintech",
-            "description": "Financial technology platforms processing payments for their users",
-            "avg_monthly_volume": 540000,
-            "avg_growth_rate": 0.28,  # 28% growth
-            "avg_transaction_size": 220,
-            "merchant_count": 68,
-            "industries": {
-                "Payments": 0.45,
-                "Lending": 0.22,
-                "Investing": 0.18,
-                "Banking": 0.10,
-                "Other": 0.05
-            },
-            "feature_adoption": {
-                "One-Click Payment": 0.85,
-                "Subscription API": 0.78,
-                "Advanced Fraud Tools": 0.92,
-                "Mobile SDK": 0.65,
-                "Embedded Checkout": 0.88
-            },
-            "success_metrics": {
-                "retention_rate": 0.94,
-                "feature_adoption_rate": 0.88,
-                "avg_volume_growth": 0.28
-            },
-            "color": "hotpink"
-        },
-        {
-            "id": "subscription_services",
-            "name": "Subscription Services",
-            "description": "Businesses with recurring revenue models",
-            "avg_monthly_volume": 95000,
-            "avg_growth_rate": 0.24,  # 24% growth
-            "avg_transaction_size": 45,
-            "merchant_count": 105,
-            "industries": {
-                "Digital Content": 0.32,
-                "Box Subscriptions": 0.28,
-                "SaaS": 0.22,
-                "Service Subscriptions": 0.12,
-                "Other": 0.06
-            },
-            "feature_adoption": {
-                "One-Click Payment": 0.68,
-                "Subscription API": 0.95,
-                "Advanced Fraud Tools": 0.72,
-                "Mobile SDK": 0.58,
-                "Embedded Checkout": 0.45
-            },
-            "success_metrics": {
-                "retention_rate": 0.90,
-                "feature_adoption_rate": 0.72,
-                "avg_volume_growth": 0.24
-            },
-            "color": "gold"
-        },
-        {
-            "id": "emerging_marketplace",
-            "name": "Emerging Marketplaces",
-            "description": "Growing multi-vendor marketplace platforms",
-            "avg_monthly_volume": 280000,
-            "avg_growth_rate": 0.42,  # 42% growth
-            "avg_transaction_size": 95,
-            "merchant_count": 52,
-            "industries": {
-                "Gig Economy": 0.35,
-                "Freelance Services": 0.25,
-                "Product Marketplaces": 0.22,
-                "Food Delivery": 0.12,
-                "Other": 0.06
-            },
-            "feature_adoption": {
-                "One-Click Payment": 0.78,
-                "Subscription API": 0.32,
-                "Advanced Fraud Tools": 0.82,
-                "Mobile SDK": 0.75,
-                "Embedded Checkout": 0.88
-            },
-            "success_metrics": {
-                "retention_rate": 0.89,
-                "feature_adoption_rate": 0.74,
-                "avg_volume_growth": 0.42
-            },
-            "color": "coral"
-        }
-    ]
-    
-    return segments
-
-# Generate mock data for merchants based on segments
-def generate_merchants_by_segment(segments, num_merchants=500):
-    np.random.seed(42)
-    
-    # Account Managers
-    account_managers = ['Alex Thompson', 'Samantha Lee', 'Marcus Johnson', 'Rachel Chen', 'David Kim']
-    
-    # Contact names generator
-    first_names = ['John', 'Emma', 'Michael', 'Sophia', 'James', 'Olivia', 'Robert', 'Ava', 'William', 'Isabella']
-    last_names = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Garcia', 'Rodriguez', 'Wilson']
-    
-    # Features
-    features = ['One-Click Payment', 'Subscription API', 'Advanced Fraud Tools', 'Mobile SDK', 'Embedded Checkout']
-    
-    merchants = []
-    merchant_id = 1
-    
-    # Generate merchants for each segment
-    for segment in segments:
-        # Calculate how many merchants to create for this segment
-        segment_merchant_count = int(segment['merchant_count'])
-        
-        # Get segment attributes for reference
-        segment_id = segment['id']
-        segment_name = segment['name']
-        feature_adoption = segment['feature_adoption']
-        industries = segment['industries']
-        
-        # Distribution parameters
-        avg_volume = segment['avg_monthly_volume']
-        volume_std = avg_volume * 0.3  # 30% standard deviation
-        avg_growth = segment['avg_growth_rate']
-        growth_std = 0.05  # 5% standard deviation
-        
-        for _ in range(segment_merchant_count):
-            # Generate basic merchant info
-            merchant = {
-                'merchant_id': f'M{merchant_id:04d}',
-                'merchant_name': f'Merchant {merchant_id}',
-                'segment_id': segment_id,
-                'segment_name': segment_name,
-                'account_manager': np.random.choice(account_managers),
-                'contact_name': f"{np.random.choice(first_names)} {np.random.choice(last_names)}",
-                'contact_email': f"contact{merchant_id}@example.com",
-                'contact_phone': f"+1-555-{np.random.randint(100, 999)}-{np.random.randint(1000, 9999)}"
-            }
-            
-            # Assign an industry based on segment distribution
-            industry_items = list(industries.items())
-            industry_names = [item[0] for item in industry_items]
-            industry_weights = [item[1] for item in industry_items]
-            merchant['industry'] = np.random.choice(industry_names, p=industry_weights)
-            
-            # Generate volume data with some randomness
-            merchant['monthly_volume'] = int(np.random.normal(avg_volume, volume_std))
-            merchant['growth_rate'] = max(0, min(1, np.random.normal(avg_growth, growth_std)))
-            
-            # Determine feature adoption
-            merchant_features = {}
-            for feature in features:
-                # Probability of adoption based on segment characteristics
-                adoption_prob = feature_adoption.get(feature, 0.5)
-                merchant_features[feature] = np.random.random() < adoption_prob
-            
-            merchant['features'] = merchant_features
-            merchant['features_adopted'] = sum(merchant_features.values())
-            
-            # Add success metrics
-            merchant['tenure'] = np.random.randint(1, 48)  # 1-48 months
-            merchant['retention_probability'] = min(0.98, max(0.5, 
-                                                           0.75 + 
-                                                           0.05 * (merchant['features_adopted'] / len(features)) + 
-                                                           0.02 * (merchant['growth_rate'] * 10) +
-                                                           0.01 * (merchant['tenure'] / 12)))
-            
-            # Custom metrics for opportunity scoring
-            merchant['payment_success_rate'] = 0.95 + (0.04 * np.random.random())
-            merchant['average_order_frequency'] = np.random.randint(1, 12)  # Average orders per customer per year
-            
-            merchants.append(merchant)
-            merchant_id += 1
-    
-    # Convert to DataFrame
-    merchants_df = pd.DataFrame(merchants)
-    
-    # Calculate the opportunity score - a combination of factors that indicate upsell potential
-    merchants_df['opportunity_score'] = (
-        # Higher volume means higher opportunity value
-        (merchants_df['monthly_volume'] / 10000) * 0.3 +
-        # Higher growth rate means higher potential
-        (merchants_df['growth_rate'] * 100) * 0.3 +
-        # More features adopted indicates receptiveness to new features
-        (merchants_df['features_adopted'] / len(features)) * 100 * 0.2 +
-        # Longer tenure means more stable relationship
-        (merchants_df['tenure'] / 48) * 100 * 0.1 +
-        # Higher retention probability means lower risk
-        (merchants_df['retention_probability'] * 100) * 0.1
-    )
-    
-    # Scale opportunity score to 0-100 range
-    min_score = merchants_df['opportunity_score'].min()
-    max_score = merchants_df['opportunity_score'].max()
-    merchants_df['opportunity_score'] = ((merchants_df['opportunity_score'] - min_score) / 
-                                       (max_score - min_score)) * 100
-    
-    # Round to integers
-    merchants_df['opportunity_score'] = merchants_df['opportunity_score'].astype(int)
-    
-    return merchants_df
-
-# Generate feature impact data
-def generate_feature_impact_data(features, segments):
-    # Create dataframe showing the impact of each feature on key metrics
-    impact_data = []
-    
-    for feature in features:
-        for segment in segments:
-            segment_id = segment['id']
-            segment_name = segment['name']
-            
-            # Base impact values
-            base_values = {
-                'volume_impact': np.random.uniform(0.05, 0.25),
-                'retention_impact': np.random.uniform(0.02, 0.15),
-                'growth_impact': np.random.uniform(0.03, 0.30)
-            }
-            
-            # Adjust based on the feature adoption - features with higher adoption in successful segments
-            # have higher impact
-            adoption_rate = segment['feature_adoption'].get(feature, 0.5)
-            impact_multiplier = 0.5 + adoption_rate
-            
-            # Create record for this feature-segment combination
-            impact_record = {
-                'feature': feature,
-                'segment_id': segment_id,
-                'segment_name': segment_name,
-                'volume_impact': base_values['volume_impact'] * impact_multiplier,
-                'retention_impact': base_values['retention_impact'] * impact_multiplier,
-                'growth_impact': base_values['growth_impact'] * impact_multiplier,
-                'adoption_rate': adoption_rate
-            }
-            
-            impact_data.append(impact_record)
-    
-    return pd.DataFrame(impact_data)
+# Dollar amount with the sign ahead of the symbol, e.g. -$1,234
+def format_dollars(amount):
+    return f"{'-' if amount < 0 else ''}${abs(amount):,.0f}"
 
 # Create a pixel art segment icon
 def create_pixel_segment_icon(color='cyan'):
@@ -657,66 +382,66 @@ def create_pixel_segment_icon(color='cyan'):
     
     return f"data:image/png;base64,{img_str}"
 
-# Generate opportunity recommendations for merchants
-def generate_opportunity_recommendations(merchants_df, feature, target_segment=None):
-    """Generate a list of merchants who would benefit from adopting a specific feature"""
-    
-    # Filter by segment if specified
-    if target_segment:
-        merchants = merchants_df[merchants_df['segment_id'] == target_segment].copy()
-    else:
-        merchants = merchants_df.copy()
-    
-    # Get feature column name
-    feature_col = f"features.{feature}"
-    
-    # Filter merchants who don't have the feature yet
-    non_adopters = merchants[~merchants['features'].apply(lambda x: x.get(feature, False))].copy()
-    
-    if len(non_adopters) == 0:
-        return pd.DataFrame()
-    
-    # Calculate opportunity score specific to this feature
-    # This simulates the model that would predict which merchants would benefit most
-    feature_opportunity_score = (
-        non_adopters['monthly_volume'] * 0.4 +
-        non_adopters['growth_rate'] * 100 * 0.3 +
-        non_adopters['retention_probability'] * 100 * 0.2 +
-        non_adopters['tenure'] * 0.1
-    )
-    
-    # Scale to 0-100
-    min_score = feature_opportunity_score.min()
-    max_score = feature_opportunity_score.max()
-    if max_score > min_score:  # Avoid division by zero
-        feature_opportunity_score = ((feature_opportunity_score - min_score) / 
-                                    (max_score - min_score)) * 100
-    
-    non_adopters['feature_opportunity_score'] = feature_opportunity_score.astype(int)
-    
-    # Sort by opportunity score (descending)
-    recommended_merchants = non_adopters.sort_values('feature_opportunity_score', ascending=False)
-    
-    # Include only relevant columns for display
-    display_cols = ['merchant_id', 'merchant_name', 'segment_name', 'industry', 
-                   'monthly_volume', 'growth_rate', 'account_manager', 
-                   'contact_name', 'feature_opportunity_score']
-    
-    return recommended_merchants[display_cols].head(10)  # Return top 10 opportunities
+# Results shared by every session through the LRU result cache, keyed by dataset fingerprint
+# and arguments (the index is derived from the same data, so it is left out of the key)
+cached_recommendations = memoize(RESULT_CACHE, ignore=('index',))(generate_opportunity_recommendations)
+cached_success_profiles = memoize(RESULT_CACHE)(success_profiles)
+cached_feature_recipes = memoize(RESULT_CACHE)(feature_recipes)
+
+# Load the dataset once per process and TTL, shared read-only by every session. The
+# dataset key changes on every reload, so everything cached under it is rebuilt.
+@st.cache_resource(ttl=DATASET_TTL, show_spinner="Loading merchant data...")
+def load_dataset():
+    segments = generate_merchant_segments()
+    merchants_df, feature_impact_df = load_or_generate_dataset(segments)
+    loaded_at = datetime.datetime.now()
+    dataset_key = f"{snapshot_key(segments)}-{loaded_at:%Y%m%d%H%M%S%f}"
+    return segments, merchants_df, feature_impact_df, dataset_key, loaded_at
+
+# Build the opportunity index once per dataset version (merchants_df itself is not hashed)
+@st.cache_resource(ttl=DATASET_TTL)
+def get_opportunity_index(_merchants_df, dataset_key):
+    return OpportunityIndex(_merchants_df)
+
+# Build the similar-merchant index once per dataset version
+@st.cache_resource(ttl=DATASET_TTL)
+def get_similar_merchant_index(_merchants_df, dataset_key):
+    return SimilarMerchantIndex(_merchants_df)
+
+# A segment's merchants, cached per dataset version and segment
+@st.cache_data(ttl=DATASET_TTL, max_entries=32, show_spinner=False)
+def get_segment_merchants(_merchants_df, dataset_key, segment_id):
+    return _merchants_df[_merchants_df['segment_id'] == segment_id]
+
+# A feature's impact rows, cached per dataset version and feature
+@st.cache_data(ttl=DATASET_TTL, max_entries=64, show_spinner=False)
+def get_feature_impact(_feature_impact_df, dataset_key, feature):
+    return _feature_impact_df[_feature_impact_df['feature'] == feature]
+
+# Projected revenue of a segment's low adopters, cached per dataset version and selection
+@st.cache_data(ttl=DATASET_TTL, max_entries=64, show_spinner=False)
+def get_low_adopter_uplift(_merchants_df, _feature_impact_df, dataset_key, segment_id, features):
+    segment_merchants = get_segment_merchants(_merchants_df, dataset_key, segment_id)
+    segment_low_adopters = low_adopters(segment_merchants, cached_success_profiles(_merchants_df))
+    return simulate_revenue_uplift(segment_low_adopters, features, _feature_impact_df)
+
+# Drop the shared dataset and everything derived from it, so the next run reloads
+def invalidate_dataset():
+    load_dataset.clear()
+    get_opportunity_index.clear()
+    get_similar_merchant_index.clear()
+    st.cache_data.clear()
+    RESULT_CACHE.clear()
 
 # Main application
 def main():
     local_css()
     
-    # Generate mock data
-    segments = generate_merchant_segments()
-    merchants_df = generate_merchants_by_segment(segments)
+    # Shared mock data (generated, or reloaded from its on-disk snapshot, once per process and TTL)
+    segments, merchants_df, feature_impact_df, dataset_key, loaded_at = load_dataset()
     
     # Get features list
-    features = ['One-Click Payment', 'Subscription API', 'Advanced Fraud Tools', 'Mobile SDK', 'Embedded Checkout']
-    
-    # Generate feature impact data
-    feature_impact_df = generate_feature_impact_data(features, segments)
+    features = FEATURES
     
     # Application title
     st.markdown("<h1>PAYPLUG GROWTH FINDER QUEST 🎮</h1>", unsafe_allow_html=True)
@@ -755,15 +480,34 @@ def main():
         </div>
         """, unsafe_allow_html=True)
     
+    # Result cache counters, for sizing the cache
+    cache_stats = RESULT_CACHE.stats()
+    st.sidebar.markdown("### 💾 RESULT CACHE")
+    st.sidebar.markdown(f"""
+    <div style="font-family: 'VT323', monospace; font-size: 1.1rem; color: var(--dark);">
+        {cache_stats['hits']} hits • {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)<br>
+        {cache_stats['entries']} entries • {cache_stats['bytes'] / 2 ** 20:.1f} MB • {cache_stats['evictions']} evictions<br>
+        Data loaded {loaded_at:%Y-%m-%d %H:%M} • refreshed every {DATASET_TTL // 60} min
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Reload the shared dataset for every session
+    if st.sidebar.button("🔄 RELOAD DATA"):
+        invalidate_dataset()
+        st.rerun()
+    
     # Main content based on selected mode
     if app_mode == "Segment Explorer":
-        display_segment_explorer(segments, merchants_df, features)
+        display_segment_explorer(segments, merchants_df, features, dataset_key)
     elif app_mode == "Feature Impact Analyzer":
-        display_feature_impact(feature_impact_df, segments, features)
+        display_feature_impact(feature_impact_df, segments, features, dataset_key)
     elif app_mode == "Opportunity Generator":
-        display_opportunity_generator(merchants_df, segments, features)
+        opportunity_index = get_opportunity_index(merchants_df, dataset_key)
+        similar_index = get_similar_merchant_index(merchants_df, dataset_key)
+        display_opportunity_generator(merchants_df, segments, features, feature_impact_df, opportunity_index,
+                                      similar_index)
     elif app_mode == "Success Profiles":
-        display_success_profiles(segments, merchants_df)
+        display_success_profiles(segments, merchants_df, feature_impact_df, dataset_key)
     
     # Footer
     st.markdown("""
@@ -773,7 +517,7 @@ def main():
     """, unsafe_allow_html=True)
 
 # Display Segment Explorer
-def display_segment_explorer(segments, merchants_df, features):
+def display_segment_explorer(segments, merchants_df, features, dataset_key):
     st.markdown("## SEGMENT EXPLORER")
     st.markdown("Select a merchant segment to analyze its characteristics and performance.")
     
@@ -786,7 +530,7 @@ def display_segment_explorer(segments, merchants_df, features):
     
     if selected_segment:
         # Get merchants in this segment
-        segment_merchants = merchants_df[merchants_df['segment_id'] == selected_segment['id']]
+        segment_merchants = get_segment_merchants(merchants_df, dataset_key, selected_segment['id'])
         
         # Display segment overview
         col1, col2, col3, col4 = st.columns(4)
@@ -920,28 +664,10 @@ def display_segment_explorer(segments, merchants_df, features):
             # Sample merchants from this segment
             if len(segment_merchants) > 0:
                 sample_size = min(5, len(segment_merchants))
-                sample_merchants = segment_merchants.sample(sample_size)
+                sample_merchants = with_contact_info(segment_merchants.sample(sample_size))
                 
-                for _, merchant in sample_merchants.iterrows():
-                    # Calculate feature badges
-                    feature_badges = ""
-                    for feature, adopted in merchant['features'].items():
-                        if adopted:
-                            feature_badges += f'<span class="feature-badge">{feature}</span> '
-                    
-                    st.markdown(f"""
-                    <div class="pixel-card">
-                        <div class="pixel-card-title">{merchant['merchant_name']}</div>
-                        <div class="pixel-card-content">
-                            <div><strong>Industry:</strong> {merchant['industry']}</div>
-                            <div><strong>Monthly Volume:</strong> ${merchant['monthly_volume']:,}</div>
-                            <div><strong>Growth Rate:</strong> {merchant['growth_rate']*100:.1f}%</div>
-                            <div><strong>Account Manager:</strong> {merchant['account_manager']}</div>
-                            <div><strong>Features Adopted:</strong> {merchant['features_adopted']} of {len(features)}</div>
-                            <div style="margin-top: 10px;">{feature_badges}</div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                # All example cards in one element
+                st.markdown(merchant_cards(sample_merchants, features), unsafe_allow_html=True)
             else:
                 st.info("No merchants found in this segment.")
                 
@@ -979,7 +705,7 @@ def display_segment_explorer(segments, merchants_df, features):
             x="monthly_volume",
             y="growth_rate",
             size="tenure",
-            hover_name="merchant_name",
+            hover_name="merchant_id",
             labels={
                 'monthly_volume': 'Monthly Volume ($)',
                 'growth_rate': 'Growth Rate',
@@ -1003,7 +729,7 @@ def display_segment_explorer(segments, merchants_df, features):
         st.plotly_chart(fig, use_container_width=True)
     
 # Display Feature Impact Analyzer
-def display_feature_impact(feature_impact_df, segments, features):
+def display_feature_impact(feature_impact_df, segments, features, dataset_key):
     st.markdown("## FEATURE IMPACT ANALYZER")
     st.markdown("Explore how different features impact key performance metrics across segments.")
     
@@ -1011,7 +737,7 @@ def display_feature_impact(feature_impact_df, segments, features):
     selected_feature = st.selectbox("Select a feature to analyze:", features)
     
     # Filter data for selected feature
-    feature_data = feature_impact_df[feature_impact_df['feature'] == selected_feature]
+    feature_data = get_feature_impact(feature_impact_df, dataset_key, selected_feature)
     
     if not feature_data.empty:
         # Display feature overview
@@ -1034,7 +760,7 @@ def display_feature_impact(feature_impact_df, segments, features):
             st.markdown(f"""
             <div class="metric-card">
                 <div class="metric-label">AVG VOLUME BOOST</div>
-                <div class="metric-value">+{avg_volume_impact:.1f}%</div>
+                <div class="metric-value">{avg_volume_impact:+.1f}%</div>
             </div>
             """, unsafe_allow_html=True)
             
@@ -1043,7 +769,7 @@ def display_feature_impact(feature_impact_df, segments, features):
             st.markdown(f"""
             <div class="metric-card">
                 <div class="metric-label">AVG RETENTION BOOST</div>
-                <div class="metric-value">+{avg_retention_impact:.1f}%</div>
+                <div class="metric-value">{avg_retention_impact:+.1f}%</div>
             </div>
             """, unsafe_allow_html=True)
             
@@ -1052,7 +778,7 @@ def display_feature_impact(feature_impact_df, segments, features):
             st.markdown(f"""
             <div class="metric-card">
                 <div class="metric-label">AVG GROWTH BOOST</div>
-                <div class="metric-value">+{avg_growth_impact:.1f}%</div>
+                <div class="metric-value">{avg_growth_impact:+.1f}%</div>
             </div>
             """, unsafe_allow_html=True)
         
@@ -1116,7 +842,7 @@ def display_feature_impact(feature_impact_df, segments, features):
             feature_data,
             x="adoption_rate",
             y="volume_impact",
-            size="growth_impact",
+            size=feature_data["growth_impact"].clip(lower=0),  # Marker sizes must be non-negative
             color="segment_name",
             hover_name="segment_name",
             labels={
@@ -1164,13 +890,13 @@ def display_feature_impact(feature_impact_df, segments, features):
                 Current Adoption Rate: {best_segment['adoption_rate']*100:.0f}%
             </div>
             <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--light); margin-bottom: 5px;">
-                Potential Volume Impact: +{best_segment['volume_impact']*100:.1f}%
+                Potential Volume Impact: {best_segment['volume_impact']*100:+.1f}%
             </div>
             <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--light); margin-bottom: 5px;">
-                Potential Growth Impact: +{best_segment['growth_impact']*100:.1f}%
+                Potential Growth Impact: {best_segment['growth_impact']*100:+.1f}%
             </div>
             <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--light); margin-bottom: 20px;">
-                Potential Retention Impact: +{best_segment['retention_impact']*100:.1f}%
+                Potential Retention Impact: {best_segment['retention_impact']*100:+.1f}%
             </div>
             <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--secondary); margin-bottom: 10px; border-top: 2px dotted var(--secondary); padding-top: 10px;">
                 <strong>Implementation Strategy:</strong> Target merchants in the {best_segment['segment_name']} segment who haven't yet adopted {selected_feature} for the highest ROI on sales efforts.
@@ -1179,7 +905,8 @@ def display_feature_impact(feature_impact_df, segments, features):
         """, unsafe_allow_html=True)
         
 # Display Opportunity Generator
-def display_opportunity_generator(merchants_df, segments, features):
+def display_opportunity_generator(merchants_df, segments, features, feature_impact_df, opportunity_index=None,
+                                  similar_index=None):
     st.markdown("## OPPORTUNITY GENERATOR")
     st.markdown("Find specific merchants who would benefit most from adopting new features.")
     
@@ -1200,8 +927,24 @@ def display_opportunity_generator(merchants_df, segments, features):
         if selected_segment:
             target_segment_id = selected_segment['id']
     
+    # Bulk export of every opportunity for CRM handoff, generated only when clicked. Downloads
+    # are built in memory, so large portfolios are pointed to the streaming command line export.
+    if len(merchants_df) <= MAX_DOWNLOAD_MERCHANTS:
+        st.download_button("EXPORT ALL OPPORTUNITIES (CSV)", data=lambda: opportunities_csv(merchants_df),
+                           file_name="opportunities.csv", mime="text/csv")
+    else:
+        st.info(f"This portfolio is too large to download from the app ({len(merchants_df):,} merchants). "
+                "Export it to a file with `python -m utils.export opportunities.csv`.")
+    
+    # Page through the best-ranked opportunities
+    ranked_count = min(count_opportunities(merchants_df, selected_feature, target_segment_id, opportunity_index),
+                       MAX_RANKED_OPPORTUNITIES)
+    num_pages = max(1, -(-ranked_count // OPPORTUNITIES_PER_PAGE))
+    page = st.number_input(f"Page (of {num_pages}):", min_value=1, max_value=num_pages, value=1, step=1) - 1
+    
     # Generate opportunity recommendations
-    opportunities = generate_opportunity_recommendations(merchants_df, selected_feature, target_segment_id)
+    opportunities = cached_recommendations(merchants_df, selected_feature, target_segment_id,
+                                           k=OPPORTUNITIES_PER_PAGE, page=page, index=opportunity_index)
     
     if not opportunities.empty:
         # Display opportunity header
@@ -1213,51 +956,34 @@ def display_opportunity_generator(merchants_df, segments, features):
             <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--light); margin-bottom: 20px; text-align: center;">
                 These merchants are prime candidates for adopting <span style="color: var(--primary);">{selected_feature}</span>
             </div>
+            <div style="font-family: 'VT323', monospace; font-size: 1.1rem; color: var(--secondary); text-align: center;">
+                Ranks {page * OPPORTUNITIES_PER_PAGE + 1}-{page * OPPORTUNITIES_PER_PAGE + len(opportunities)} of {ranked_count}
+            </div>
         </div>
         """, unsafe_allow_html=True)
         
-        # Display opportunity cards for each merchant
-        for idx, opportunity in opportunities.iterrows():
-            opportunity_score = opportunity['feature_opportunity_score']
-            
-            # Determine score color based on value
-            if opportunity_score >= 80:
-                score_color = "var(--tertiary)"  # Green for high scores
-            elif opportunity_score >= 50:
-                score_color = "var(--warning)"   # Orange for medium scores
-            else:
-                score_color = "var(--danger)"    # Red for low scores
-            
-            # Format growth rate as percentage
-            growth_display = f"{opportunity['growth_rate']*100:.1f}%"
-            
-            st.markdown(f"""
-            <div class="pixel-card" style="display: flex; align-items: center;">
-                <div style="flex: 1;">
-                    <div class="pixel-card-title">{opportunity['merchant_name']}</div>
-                    <div class="pixel-card-content">
-                        <div><strong>Segment:</strong> {opportunity['segment_name']}</div>
-                        <div><strong>Industry:</strong> {opportunity['industry']}</div>
-                        <div><strong>Monthly Volume:</strong> ${opportunity['monthly_volume']:,}</div>
-                        <div><strong>Growth Rate:</strong> {growth_display}</div>
-                        <div><strong>Account Manager:</strong> {opportunity['account_manager']}</div>
-                        <div><strong>Contact:</strong> {opportunity['contact_name']}</div>
-                    </div>
-                </div>
-                <div style="width: 100px; text-align: center; padding: 10px;">
-                    <div style="font-family: 'VT323', monospace; font-size: 1rem; color: var(--light); margin-bottom: 5px;">
-                        OPPORTUNITY
-                    </div>
-                    <div style="font-family: 'Press Start 2P', cursive; font-size: 1.8rem; color: {score_color};">
-                        {opportunity_score}
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+        # Similar merchants that already use the feature, to back each recommendation
+        if similar_index is not None:
+            similar_adopters = similar_index.similar_adopters(opportunities['merchant_id'], selected_feature, k=3)
+        else:
+            similar_adopters = pd.DataFrame(columns=['similar_to', 'merchant_name', 'growth_rate'])
+        
+        # Display the opportunity cards, all in one element
+        st.markdown(opportunity_cards(opportunities, selected_feature, similar_adopters), unsafe_allow_html=True)
         
         # Display strategy tips
         st.markdown("### IMPLEMENTATION STRATEGY")
         
+        # Projected fee revenue if this page's merchants adopt the feature
+        uplift = simulate_revenue_uplift(merchants_df.loc[opportunities.index], selected_feature, feature_impact_df)
+        
+        if not similar_adopters.empty:
+            similar_tip = (f"Highlight that similar merchants already using {selected_feature} grow "
+                           f"{similar_adopters['growth_rate'].mean()*100:.1f}% on average "
+                           f"(vs {opportunities['growth_rate'].mean()*100:.1f}% for these merchants)")
+        else:
+            similar_tip = f"Share {selected_feature} success stories from other merchants in their industry"
+        
         st.markdown(f"""
         <div class="game-container">
             <div style="font-family: 'Press Start 2P', cursive; font-size: 1.2rem; color: var(--tertiary); margin-bottom: 15px;">
@@ -1265,21 +991,38 @@ def display_opportunity_generator(merchants_df, segments, features):
             </div>
             <ul style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--light); margin-bottom: 20px;">
                 <li>Contact the top 3 merchants first for highest ROI</li>
-                <li>Highlight that other similar merchants have seen {random.randint(15, 35)}% volume growth after adopting {selected_feature}</li>
+                <li>{similar_tip}</li>
                 <li>Prepare customized demos showing {selected_feature} in their specific industry context</li>
                 <li>Offer implementation support package to speed adoption</li>
                 <li>Consider promotion or discount for the first 3 months</li>
             </ul>
             <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--secondary); margin-top: 10px; text-align: center;">
-                Estimated Additional Annual Revenue: ${random.randint(50000, 250000):,}
+                Estimated Additional Annual Revenue: {format_dollars(uplift['mean'])}
+            </div>
+            <div style="font-family: 'VT323', monospace; font-size: 1rem; color: var(--light); text-align: center;">
+                90% range: {format_dollars(uplift['p5'])} to {format_dollars(uplift['p95'])}
             </div>
         </div>
         """, unsafe_allow_html=True)
+        
+        # Spread the ranked leads across account managers without overloading anyone
+        st.markdown("### ACCOUNT MANAGER QUEUES")
+        leads_per_manager = st.number_input("Leads per manager:", min_value=1, max_value=100, value=5, step=1)
+        leads = cached_recommendations(merchants_df, selected_feature, target_segment_id,
+                                       k=MAX_RANKED_OPPORTUNITIES, index=opportunity_index)
+        assignments = assign_opportunities(leads, leads_per_manager, managers=ACCOUNT_MANAGERS)
+        
+        queue_columns = ['merchant_name', 'segment_name', 'contact_name', 'feature_opportunity_score', 'reassigned']
+        for manager, tab in zip(ACCOUNT_MANAGERS, st.tabs(ACCOUNT_MANAGERS)):
+            with tab:
+                queue = assignments[assignments['assigned_manager'] == manager]
+                st.markdown(f"**{len(queue)} leads** ({int(queue['reassigned'].sum())} handed over from other managers)")
+                st.dataframe(queue[queue_columns], hide_index=True, use_container_width=True)
     else:
         st.info(f"No opportunities found. All merchants in the selected segment are already using {selected_feature} or no merchants match the criteria.")
 
 # Display Success Profiles
-def display_success_profiles(segments, merchants_df):
+def display_success_profiles(segments, merchants_df, feature_impact_df, dataset_key):
     st.markdown("## SUCCESS PROFILES")
     st.markdown("Explore the defining characteristics of the most successful merchants in each segment.")
     
@@ -1291,26 +1034,10 @@ def display_success_profiles(segments, merchants_df):
     selected_segment = next((segment for segment in segments if segment['name'] == selected_segment_name), None)
     
     if selected_segment:
-        # Get merchants in this segment
-        segment_merchants = merchants_df[merchants_df['segment_id'] == selected_segment['id']].copy()
+        # Look the segment's top performers (top 20%) up in the profiles of all segments
+        profile = segment_profile(cached_success_profiles(merchants_df), selected_segment['id'])
         
-        if not segment_merchants.empty:
-            # Add a success score based on growth and volume
-            segment_merchants['success_score'] = (
-                segment_merchants['monthly_volume'] / segment_merchants['monthly_volume'].max() * 0.6 +
-                segment_merchants['growth_rate'] / segment_merchants['growth_rate'].max() * 0.4
-            ) * 100
-            
-            # Get top performers (top 20%)
-            threshold = segment_merchants['success_score'].quantile(0.8)
-            top_performers = segment_merchants[segment_merchants['success_score'] >= threshold]
-            
-            # Get feature adoption rates for top performers
-            top_feature_adoption = {}
-            for feature in ['One-Click Payment', 'Subscription API', 'Advanced Fraud Tools', 'Mobile SDK', 'Embedded Checkout']:
-                top_feature_adoption[feature] = top_performers['features'].apply(
-                    lambda x: x.get(feature, False)).mean()
-            
+        if profile is not None:
             # Display success profile header
             st.markdown(f"""
             <div class="game-container">
@@ -1318,7 +1045,7 @@ def display_success_profiles(segments, merchants_df):
                     {selected_segment_name} SUCCESS BLUEPRINT
                 </div>
                 <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--light); margin-bottom: 20px; text-align: center;">
-                    Analysis of top {len(top_performers)} merchants in this segment
+                    Analysis of top {profile['top_count']} merchants in this segment
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -1327,8 +1054,8 @@ def display_success_profiles(segments, merchants_df):
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                top_avg_volume = top_performers['monthly_volume'].mean()
-                segment_avg_volume = segment_merchants['monthly_volume'].mean()
+                top_avg_volume = profile['top_avg_volume']
+                segment_avg_volume = profile['segment_avg_volume']
                 volume_diff = ((top_avg_volume / segment_avg_volume) - 1) * 100
                 
                 st.markdown(f"""
@@ -1342,8 +1069,8 @@ def display_success_profiles(segments, merchants_df):
                 """, unsafe_allow_html=True)
                 
             with col2:
-                top_avg_growth = top_performers['growth_rate'].mean() * 100
-                segment_avg_growth = segment_merchants['growth_rate'].mean() * 100
+                top_avg_growth = profile['top_avg_growth'] * 100
+                segment_avg_growth = profile['segment_avg_growth'] * 100
                 growth_diff = top_avg_growth - segment_avg_growth
                 
                 st.markdown(f"""
@@ -1357,8 +1084,8 @@ def display_success_profiles(segments, merchants_df):
                 """, unsafe_allow_html=True)
                 
             with col3:
-                top_avg_features = top_performers['features_adopted'].mean()
-                segment_avg_features = segment_merchants['features_adopted'].mean()
+                top_avg_features = profile['top_avg_features']
+                segment_avg_features = profile['segment_avg_features']
                 features_diff = top_avg_features - segment_avg_features
                 
                 st.markdown(f"""
@@ -1375,19 +1102,7 @@ def display_success_profiles(segments, merchants_df):
             st.markdown("### KEY FEATURE ADOPTION")
             
             # Compare top performers feature adoption vs segment average
-            feature_comparison = []
-            for feature in ['One-Click Payment', 'Subscription API', 'Advanced Fraud Tools', 'Mobile SDK', 'Embedded Checkout']:
-                top_adoption = top_performers['features'].apply(lambda x: x.get(feature, False)).mean()
-                avg_adoption = segment_merchants['features'].apply(lambda x: x.get(feature, False)).mean()
-                
-                feature_comparison.append({
-                    'feature': feature,
-                    'top_adoption': top_adoption,
-                    'avg_adoption': avg_adoption,
-                    'difference': top_adoption - avg_adoption
-                })
-            
-            feature_df = pd.DataFrame(feature_comparison)
+            feature_df = profile['feature_comparison']
             
             # Create a bar chart comparing adoption rates
             fig = go.Figure()
@@ -1437,7 +1152,18 @@ def display_success_profiles(segments, merchants_df):
             top_differentiators = feature_df.head(3)['feature'].tolist()
             
             # Industry distribution of top performers
-            top_industries = top_performers['industry'].value_counts(normalize=True).head(3)
+            top_industries = profile['top_industries']
+            
+            # Measured feature combinations, best top-performer lift first
+            recipes = cached_feature_recipes(merchants_df)
+            segment_recipes = recipes[recipes.index == selected_segment['id']]
+            if not segment_recipes.empty:
+                best_recipe = segment_recipes.iloc[0]
+                playbook_tip = (f"Create specific success playbooks featuring the {' + '.join(best_recipe['features'])} combination "
+                                f"(used by {best_recipe['top_support']*100:.0f}% of top performers, "
+                                f"{best_recipe['lift']:.1f}x the segment rate)")
+            else:
+                playbook_tip = f"Create specific success playbooks featuring {top_differentiators[0]} + {top_differentiators[1]} combination"
             
             st.markdown(f"""
             <div class="game-container">
@@ -1470,57 +1196,45 @@ def display_success_profiles(segments, merchants_df):
                     <ul style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--light); margin-bottom: 10px;">
                         <li>Focus adoption campaigns on {top_differentiators[0]} for highest impact</li>
                         <li>Target merchants in the {top_industries.index[0]} industry vertical</li>
-                        <li>Create specific success playbooks featuring {top_differentiators[0]} + {top_differentiators[1]} combination</li>
+                        <li>{playbook_tip}</li>
                         <li>Develop case studies from top performers to share with similar merchants</li>
                     </ul>
                 </div>
             </div>
             """, unsafe_allow_html=True)
             
+            # Feature combinations most over-represented among top performers
+            if not segment_recipes.empty:
+                st.markdown("### WINNING COMBINATIONS")
+                combinations = segment_recipes.head(5).assign(features=segment_recipes['features'].head(5).map(' + '.join))
+                st.dataframe(combinations[['features', 'merchants', 'support', 'top_support', 'lift']],
+                             hide_index=True, use_container_width=True,
+                             column_config={
+                                 'support': st.column_config.NumberColumn("Segment adoption", format="percent"),
+                                 'top_support': st.column_config.NumberColumn("Top performer adoption", format="percent"),
+                                 'lift': st.column_config.NumberColumn("Lift", format="%.2fx"),
+                             })
+            
             # Example top performers
             st.markdown("### TOP PERFORMER EXAMPLES")
             
             # Show top 3 merchants by success score
-            top_3 = top_performers.sort_values('success_score', ascending=False).head(3)
+            top_3 = with_contact_info(profile['top_examples'])
             
-            for idx, merchant in top_3.iterrows():
-                # Calculate feature badges
-                feature_badges = ""
-                for feature, adopted in merchant['features'].items():
-                    if adopted:
-                        feature_badges += f'<span class="feature-badge">{feature}</span> '
-                
-                growth_display = f"{merchant['growth_rate']*100:.1f}%"
-                
-                st.markdown(f"""
-                <div class="pixel-card">
-                    <div style="display: flex; align-items: center; margin-bottom: 10px;">
-                        <div style="flex: 1;">
-                            <div class="pixel-card-title">{merchant['merchant_name']}</div>
-                        </div>
-                        <div style="width: 80px; text-align: center;">
-                            <div style="font-family: 'VT323', monospace; font-size: 0.9rem; color: var(--light);">SCORE</div>
-                            <div class="opportunity-score">{int(merchant['success_score'])}</div>
-                        </div>
-                    </div>
-                    <div class="pixel-card-content">
-                        <div><strong>Industry:</strong> {merchant['industry']}</div>
-                        <div><strong>Monthly Volume:</strong> ${merchant['monthly_volume']:,}</div>
-                        <div><strong>Growth Rate:</strong> {growth_display}</div>
-                        <div><strong>Features Adopted:</strong> {merchant['features_adopted']} of {len(merchant['features'])}</div>
-                        <div style="margin-top: 10px;">{feature_badges}</div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+            st.markdown(top_performer_cards(top_3), unsafe_allow_html=True)
             
             # Recommendation for merchant targeting
             st.markdown("### OPPORTUNITY TARGETING")
             
             # Calculate how many merchants could benefit from this profile
-            segment_size = len(segment_merchants)
-            low_adoption_count = len(segment_merchants[segment_merchants['features_adopted'] < top_avg_features])
+            segment_size = profile['segment_size']
+            low_adoption_count = profile['low_adoption_count']
             potential_pct = (low_adoption_count / segment_size) * 100
             
+            # Projected fee revenue if they adopted the top differentiating features
+            uplift = get_low_adopter_uplift(merchants_df, feature_impact_df, dataset_key, selected_segment['id'],
+                                            top_differentiators[:2])
+            
             st.markdown(f"""
             <div class="game-container">
                 <div style="font-family: 'Press Start 2P', cursive; font-size: 1.2rem; color: var(--tertiary); margin-bottom: 15px;">
@@ -1534,7 +1248,11 @@ def display_success_profiles(segments, merchants_df):
                 </div>
                 
                 <div style="font-family: 'Press Start 2P', cursive; font-size: 1.8rem; color: var(--tertiary); text-align: center; margin: 20px 0;">
-                    ${random.randint(500000, 2000000):,}
+                    {format_dollars(uplift['mean'])}
+                </div>
+                
+                <div style="font-family: 'VT323', monospace; font-size: 1.1rem; color: var(--light); text-align: center; margin-bottom: 20px;">
+                    90% range: {format_dollars(uplift['p5'])} to {format_dollars(uplift['p95'])} (Monte Carlo over the impacts' sampling error)
                 </div>
                 
                 <div style="font-family: 'VT323', monospace; font-size: 1.2rem; color: var(--secondary); margin-top: 10px;">
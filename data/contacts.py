@@ -0,0 +1,75 @@
+import pandas as pd
+import numpy as np
+
+# Contact names generator
+FIRST_NAMES = ['John', 'Emma', 'Michael', 'Sophia', 'James', 'Olivia', 'Robert', 'Ava', 'William', 'Isabella']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Garcia', 'Rodriguez', 'Wilson']
+
+# Columns derived on demand instead of being stored on every merchant row
+CONTACT_COLUMNS = ['merchant_name', 'contact_name', 'contact_email', 'contact_phone']
+
+def _splitmix64(values):
+    """
+    SplitMix64 finalizer: a cheap, well-mixed 64-bit hash of each value
+
+    Args:
+        values (ndarray): uint64 values to hash
+
+    Returns:
+        ndarray: uint64 hashes (arithmetic wraps modulo 2**64)
+    """
+    z = values + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+def contact_info(merchant_ids, seed=42):
+    """
+    Derive merchant name and contact details deterministically from merchant ids
+
+    The same merchant_id (and seed) always gives the same contact, so these fields
+    can be produced only for the rows that are actually rendered or exported.
+
+    Args:
+        merchant_ids (array-like): Merchant ids such as 'M0001'
+        seed (int): Salt mixed into the hash
+
+    Returns:
+        DataFrame: merchant_name, contact_name, contact_email and contact_phone
+        columns, one row per id (indexed like ``merchant_ids`` when it is a Series)
+    """
+    merchant_ids = pd.Series(merchant_ids)
+    numbers = merchant_ids.str[1:].astype(np.int64)
+    digits = numbers.astype(str)
+
+    with np.errstate(over='ignore'):
+        hashed = _splitmix64(numbers.to_numpy().astype(np.uint64) ^ _splitmix64(np.array([seed], dtype=np.uint64)))
+
+    # Carve independent fields out of different bits of the hash
+    first = (hashed % np.uint64(len(FIRST_NAMES))).astype(np.int64)
+    last = ((hashed >> np.uint64(16)) % np.uint64(len(LAST_NAMES))).astype(np.int64)
+    exchange = 100 + ((hashed >> np.uint64(32)) % np.uint64(899)).astype(np.int64)
+    line = 1000 + ((hashed >> np.uint64(44)) % np.uint64(8999)).astype(np.int64)
+
+    return pd.DataFrame({
+        'merchant_name': 'Merchant ' + digits,
+        'contact_name': (pd.Series(FIRST_NAMES).take(first).to_numpy() + ' ' +
+                         pd.Series(LAST_NAMES).take(last).to_numpy()),
+        'contact_email': 'contact' + digits + '@example.com',
+        'contact_phone': '+1-555-' + pd.Series(exchange, index=merchant_ids.index).astype(str) +
+                         '-' + pd.Series(line, index=merchant_ids.index).astype(str),
+    }, index=merchant_ids.index)
+
+def with_contact_info(merchants_df, seed=42):
+    """
+    Add the contact columns to a (small) merchant frame, e.g. the rows about to be displayed
+
+    Args:
+        merchants_df (DataFrame): Merchant rows with a merchant_id column
+        seed (int): Salt passed to contact_info()
+
+    Returns:
+        DataFrame: Copy of ``merchants_df`` with the CONTACT_COLUMNS added
+    """
+    contacts = contact_info(merchants_df['merchant_id'], seed)
+    return merchants_df.drop(columns=CONTACT_COLUMNS, errors='ignore').join(contacts)
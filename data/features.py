@@ -0,0 +1,144 @@
+import pandas as pd
+import numpy as np
+
+# Feature catalog. A merchant's adoption is stored as a bitmask where bit i is set
+# when the merchant has adopted FEATURES[i].
+FEATURES = ['One-Click Payment', 'Subscription API', 'Advanced Fraud Tools', 'Mobile SDK', 'Embedded Checkout']
+
+def mask_dtype(num_features=None):
+    """
+    Smallest unsigned integer type that can hold one bit per feature
+
+    Args:
+        num_features (int, optional): Size of the feature catalog. Defaults to len(FEATURES).
+
+    Returns:
+        type: NumPy unsigned integer type
+    """
+    num_features = len(FEATURES) if num_features is None else num_features
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if num_features <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError(f"Cannot pack {num_features} features into a 64-bit mask")
+
+def feature_bit(feature, features=FEATURES):
+    """
+    Bit value of a feature in the adoption mask
+
+    Args:
+        feature (str): Feature name
+        features (list): Feature catalog the mask was packed with
+
+    Returns:
+        int: The feature's bit (0 if the feature is not in the catalog)
+    """
+    if feature not in features:
+        return 0
+    return 1 << features.index(feature)
+
+def pack_adoption(adoption, features=FEATURES):
+    """
+    Pack a boolean (merchants x features) adoption matrix into one mask per merchant
+
+    Args:
+        adoption (ndarray): Boolean matrix, one column per feature in ``features``
+        features (list): Feature catalog matching the matrix columns
+
+    Returns:
+        ndarray: Unsigned integer bitmask per merchant
+    """
+    dtype = mask_dtype(len(features))
+    bits = np.left_shift(np.ones(len(features), dtype=dtype), np.arange(len(features), dtype=dtype))
+    # The bits are distinct powers of two, so summing them is the same as OR-ing them
+    return (adoption * bits).sum(axis=1, dtype=dtype)
+
+def adoption_matrix(masks, features=FEATURES):
+    """
+    Unpack adoption masks into a boolean (merchants x features) matrix
+
+    Args:
+        masks (array-like): Bitmask per merchant
+        features (list): Feature catalog the masks were packed with
+
+    Returns:
+        ndarray: Boolean matrix, one column per feature
+    """
+    masks = np.asarray(masks)
+    shifts = np.arange(len(features), dtype=masks.dtype)
+    return (np.right_shift(masks[:, None], shifts) & 1).astype(bool)
+
+def has_feature(masks, feature, features=FEATURES):
+    """
+    Vectorized "has this merchant adopted the feature" test
+
+    Args:
+        masks (array-like): Bitmask per merchant, e.g. merchants_df['feature_mask']
+        feature (str): Feature name
+        features (list): Feature catalog the masks were packed with
+
+    Returns:
+        Series or ndarray: Boolean per merchant, aligned with ``masks``
+    """
+    return (masks & feature_bit(feature, features)) != 0
+
+def count_features(masks):
+    """
+    Number of adopted features per merchant (population count of the mask)
+
+    Args:
+        masks (array-like): Bitmask per merchant
+
+    Returns:
+        ndarray: Count of set bits per merchant
+    """
+    masks = np.asarray(masks)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(masks)
+
+    # NumPy < 2.0 has no popcount ufunc; count the bits byte by byte instead
+    as_bytes = masks.reshape(-1, 1).view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1, dtype=np.uint8)
+
+def adoption_rates(masks, features=FEATURES):
+    """
+    Share of merchants that adopted each feature
+
+    Args:
+        masks (array-like): Bitmask per merchant
+        features (list): Feature catalog the masks were packed with
+
+    Returns:
+        Series: Adoption rate indexed by feature name
+    """
+    return pd.Series(adoption_matrix(masks, features).mean(axis=0), index=features)
+
+def adoption_rate_by_group(merchants_df, by, features=FEATURES):
+    """
+    Share of merchants that adopted each feature, per group
+
+    Args:
+        merchants_df (DataFrame): DataFrame with a ``feature_mask`` column
+        by (str or array-like): Column name or per-merchant group labels
+        features (list): Feature catalog the masks were packed with
+
+    Returns:
+        DataFrame: One row per group, one adoption-rate column per feature
+    """
+    groups = merchants_df[by] if isinstance(by, str) else by
+    adoption = pd.DataFrame(adoption_matrix(merchants_df['feature_mask'], features),
+                            columns=features, index=merchants_df.index)
+    return adoption.groupby(groups, observed=True).mean()
+
+def adopted_feature_names(mask, features=FEATURES):
+    """
+    Names of the features set in a single merchant's mask
+
+    Args:
+        mask (int): Bitmask of one merchant
+        features (list): Feature catalog the mask was packed with
+
+    Returns:
+        list: Adopted feature names, in catalog order
+    """
+    mask = int(mask)
+    return [feature for i, feature in enumerate(features) if mask >> i & 1]
@@ -1,7 +1,11 @@
 import pandas as pd
 import numpy as np
-import random
-import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from data.contacts import with_contact_info
+from data.features import FEATURES, count_features, has_feature, pack_adoption
+from data.schema import MERCHANT_DTYPES, categorical_dtypes
+from utils.scoring import FEATURE_OPPORTUNITY_PLAN, OPPORTUNITY_PLAN
 
 def generate_merchant_segments():
     """
@@ -17,6 +21,7 @@ def generate_merchant_segments():
             "description": "Small to medium e-commerce businesses experiencing rapid growth",
             "avg_monthly_volume": 42000,
             "avg_growth_rate": 0.35,  # 35% growth
+            "volume_volatility": 0.18,  # 18% month-to-month volume swings
             "avg_transaction_size": 85,
             "merchant_count": 215,
             "industries": {
@@ -46,6 +51,7 @@ def generate_merchant_segments():
             "description": "Traditional retail businesses with stable payment volumes",
             "avg_monthly_volume": 186000,
             "avg_growth_rate": 0.08,  # 8% growth
+            "volume_volatility": 0.06,  # 6% month-to-month volume swings
             "avg_transaction_size": 125,
             "merchant_count": 148,
             "industries": {
@@ -75,6 +81,7 @@ def generate_merchant_segments():
             "description": "Financial technology platforms processing payments for their users",
             "avg_monthly_volume": 540000,
             "avg_growth_rate": 0.28,  # 28% growth
+            "volume_volatility": 0.12,  # 12% month-to-month volume swings
             "avg_transaction_size": 220,
             "merchant_count": 68,
             "industries": {
@@ -104,6 +111,7 @@ def generate_merchant_segments():
             "description": "Businesses with recurring revenue models",
             "avg_monthly_volume": 95000,
             "avg_growth_rate": 0.24,  # 24% growth
+            "volume_volatility": 0.05,  # 5% month-to-month volume swings
             "avg_transaction_size": 45,
             "merchant_count": 105,
             "industries": {
@@ -133,6 +141,7 @@ def generate_merchant_segments():
             "description": "Growing multi-vendor marketplace platforms",
             "avg_monthly_volume": 280000,
             "avg_growth_rate": 0.42,  # 42% growth
+            "volume_volatility": 0.22,  # 22% month-to-month volume swings
             "avg_transaction_size": 95,
             "merchant_count": 52,
             "industries": {
@@ -160,219 +169,484 @@ def generate_merchant_segments():
     
     return segments
 
-def generate_merchants_by_segment(segments, num_merchants=500):
+# Account managers assigned to merchants
+ACCOUNT_MANAGERS = ['Alex Thompson', 'Samantha Lee', 'Marcus Johnson', 'Rachel Chen', 'David Kim']
+
+# Average lift of an adopted feature on monthly volume (relative) and growth rate
+# (absolute), before scaling by how popular the feature is in the segment
+FEATURE_VOLUME_LIFT = 0.06
+FEATURE_GROWTH_LIFT = 0.015
+
+# Columns that consume randomness. Each one reads from its own stream, so a
+# block drawn in several chunks yields exactly the same values as one draw.
+# Contact details are not generated here; data.contacts derives them on demand.
+RANDOM_COLUMNS = ['account_manager', 'industry', 'monthly_volume', 'growth_rate', 'feature_mask', 'tenure',
+                  'payment_success_rate', 'average_order_frequency']
+
+# Segments are generated in blocks of this many merchants. Every block has its own
+# seed, so blocks can be generated in any order or in parallel with identical output.
+BLOCK_SIZE = 65_536
+
+def _block_streams(seed, segment_index, block_index):
     """
-    Generate mock merchant data based on segments
+    Create one independent random generator per random column for a block
+    
+    The streams are spawned from a SeedSequence keyed by (segment, block), so they
+    only depend on the seed and the block's position, never on the worker count.
+    
+    Args:
+        seed (int): Seed for the root SeedSequence
+        segment_index (int): Position of the segment in the segments list
+        block_index (int): Position of the block within the segment
+        
+    Returns:
+        dict: Column name to NumPy Generator mapping
+    """
+    block_seed = np.random.SeedSequence(seed, spawn_key=(segment_index, block_index))
+    children = block_seed.spawn(len(RANDOM_COLUMNS))
+    return {column: np.random.default_rng(child) for column, child in zip(RANDOM_COLUMNS, children)}
+
+def _randint(rng, low, high, size):
+    """
+    Draw integers in [low, high) from uniform floats
+    
+    Generator.integers buffers 32-bit draws between calls, which would make the
+    output depend on how a segment is chunked; flooring uniforms does not.
+    """
+    return low + (rng.random(size) * (high - low)).astype(np.int64)
+
+def merchant_categories(segments):
+    """
+    Fixed categorical dtypes for the low-cardinality merchant columns
     
     Args:
         segments (list): List of segment dictionaries from generate_merchant_segments()
-        num_merchants (int): Total number of merchants to generate
         
     Returns:
-        DataFrame: Pandas DataFrame containing merchant data
+        dict: Column name to pandas CategoricalDtype
+    """
+    industries = []
+    for segment in segments:
+        industries.extend(name for name in segment['industries'] if name not in industries)
+    
+    return categorical_dtypes({
+        'segment_id': [segment['id'] for segment in segments],
+        'segment_name': [segment['name'] for segment in segments],
+        'industry': industries,
+        'account_manager': ACCOUNT_MANAGERS,
+    })
+
+def _generate_segment_columns(segment, count, first_id, streams, categories):
+    """
+    Draw every column for a run of one segment's merchants in batched NumPy calls
+    
+    String columns with few distinct values are built directly as categorical
+    codes, and numeric columns are cast to the compact MERCHANT_DTYPES layout.
+    Names and contact details are left to data.contacts, which derives them from
+    merchant_id only for the rows that are displayed.
+    
+    Args:
+        segment (dict): Segment dictionary from generate_merchant_segments()
+        count (int): Number of merchants to generate
+        first_id (int): Numeric id of the first merchant in the run
+        streams (dict): Per-column random generators from _block_streams()
+        categories (dict): Categorical dtypes from merchant_categories()
+        
+    Returns:
+        dict: Column name to array/Series mapping, one entry per merchant
     """
-    np.random.seed(42)
+    ids = pd.Series(np.arange(first_id, first_id + count)).astype(str)
     
-    # Account Managers
-    account_managers = ['Alex Thompson', 'Samantha Lee', 'Marcus Johnson', 'Rachel Chen', 'David Kim']
+    # Segment distributions, built once per segment rather than once per merchant
+    industry_codes = categories['industry'].categories.get_indexer(list(segment['industries'].keys()))
+    industry_weights = list(segment['industries'].values())
+    adoption_probs = np.array([segment['feature_adoption'].get(feature, 0.5) for feature in FEATURES])
     
-    # Contact names generator
-    first_names = ['John', 'Emma', 'Michael', 'Sophia', 'James', 'Olivia', 'Robert', 'Ava', 'William', 'Isabella']
-    last_names = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Garcia', 'Rodriguez', 'Wilson']
+    avg_volume = segment['avg_monthly_volume']
+    volume_std = avg_volume * 0.3  # 30% standard deviation
+    avg_growth = segment['avg_growth_rate']
+    growth_std = 0.05  # 5% standard deviation
     
-    # Features
-    features = ['One-Click Payment', 'Subscription API', 'Advanced Fraud Tools', 'Mobile SDK', 'Embedded Checkout']
+    columns = {
+        'merchant_id': 'M' + ids.str.zfill(4),
+        'segment_id': _categorical(categories['segment_id'], segment['id'], count),
+        'segment_name': _categorical(categories['segment_name'], segment['name'], count),
+        'account_manager': pd.Categorical.from_codes(
+            _randint(streams['account_manager'], 0, len(ACCOUNT_MANAGERS), count),
+            dtype=categories['account_manager']),
+        'industry': pd.Categorical.from_codes(
+            industry_codes[streams['industry'].choice(len(industry_codes), size=count, p=industry_weights)],
+            dtype=categories['industry']),
+    }
     
-    merchants = []
-    merchant_id = 1
+    # Determine feature adoption: one (merchants x features) draw against the segment probabilities
+    adoption = streams['feature_mask'].random((count, len(FEATURES))) < adoption_probs
     
-    # Generate merchants for each segment
-    for segment in segments:
-        # Calculate how many merchants to create for this segment
-        segment_merchant_count = int(segment['merchant_count'])
+    # Generate volume data with some randomness. Adopted features lift volume and growth,
+    # more so for features that are popular in the segment.
+    impact_multiplier = 0.5 + adoption_probs
+    volume_lift = 1 + adoption @ (FEATURE_VOLUME_LIFT * impact_multiplier)
+    growth_lift = adoption @ (FEATURE_GROWTH_LIFT * impact_multiplier)
+    columns['monthly_volume'] = (streams['monthly_volume'].normal(avg_volume, volume_std, count) *
+                                 volume_lift).astype(np.int64)
+    columns['growth_rate'] = np.clip(streams['growth_rate'].normal(avg_growth, growth_std, count) + growth_lift,
+                                     0, 1)
+    
+    columns['feature_mask'] = pack_adoption(adoption)
+    columns['features_adopted'] = count_features(columns['feature_mask'])
+    
+    # Add success metrics
+    columns['tenure'] = _randint(streams['tenure'], 1, 48, count)  # 1-48 months
+    columns['retention_probability'] = np.clip(
+        0.75 +
+        0.05 * (columns['features_adopted'] / len(FEATURES)) +
+        0.02 * (columns['growth_rate'] * 10) +
+        0.01 * (columns['tenure'] / 12),
+        0.5, 0.98)
+    
+    # Custom metrics for opportunity scoring
+    columns['payment_success_rate'] = 0.95 + (0.04 * streams['payment_success_rate'].random(count))
+    columns['average_order_frequency'] = _randint(streams['average_order_frequency'], 1, 12, count)  # Average orders per customer per year
+    
+    for column, dtype in MERCHANT_DTYPES.items():
+        if column in columns:
+            columns[column] = columns[column].astype(dtype)
+    
+    return columns
+
+def _categorical(dtype, value, count):
+    """Categorical column repeating a single value ``count`` times"""
+    return pd.Categorical.from_codes(np.full(count, dtype.categories.get_loc(value)), dtype=dtype)
+
+def allocate_segment_counts(segments, num_merchants=None):
+    """
+    Split a total merchant count across segments in proportion to their merchant_count
+    
+    Uses largest-remainder rounding so the per-segment counts always add up to
+    exactly ``num_merchants``.
+    
+    Args:
+        segments (list): List of segment dictionaries from generate_merchant_segments()
+        num_merchants (int, optional): Total number of merchants. Defaults to the sum
+            of the segments' own merchant_count values.
         
-        # Get segment attributes for reference
-        segment_id = segment['id']
-        segment_name = segment['name']
-        feature_adoption = segment['feature_adoption']
-        industries = segment['industries']
+    Returns:
+        list: Number of merchants to generate for each segment, in segment order
+    """
+    weights = np.array([segment['merchant_count'] for segment in segments], dtype=float)
+    if num_merchants is None:
+        return [int(weight) for weight in weights]
+    
+    shares = weights / weights.sum() * num_merchants
+    counts = np.floor(shares).astype(int)
+    
+    # Hand the leftover merchants to the segments with the largest remainders
+    leftover = num_merchants - counts.sum()
+    counts[np.argsort(-(shares - counts), kind='stable')[:leftover]] += 1
+    
+    return counts.tolist()
+
+def _segment_blocks(counts):
+    """
+    Split every segment into fixed-size generation blocks
+    
+    Args:
+        counts (list): Number of merchants per segment from allocate_segment_counts()
         
-        # Distribution parameters
-        avg_volume = segment['avg_monthly_volume']
-        volume_std = avg_volume * 0.3  # 30% standard deviation
-        avg_growth = segment['avg_growth_rate']
-        growth_std = 0.05  # 5% standard deviation
+    Returns:
+        list: (segment_index, block_index, first_id, count) tuples in portfolio order
+    """
+    blocks = []
+    merchant_id = 1
+    for segment_index, segment_merchant_count in enumerate(counts):
+        for block_index, start in enumerate(range(0, segment_merchant_count, BLOCK_SIZE)):
+            blocks.append((segment_index, block_index, merchant_id + start,
+                           min(BLOCK_SIZE, segment_merchant_count - start)))
+        merchant_id += segment_merchant_count
+    return blocks
+
+def _generate_block_frame(task):
+    """
+    Generate one block of merchants (process pool entry point)
+    
+    Args:
+        task (tuple): (segment, segment_index, block_index, first_id, count, seed, categories)
         
-        for _ in range(segment_merchant_count):
-            # Generate basic merchant info
-            merchant = {
-                'merchant_id': f'M{merchant_id:04d}',
-                'merchant_name': f'Merchant {merchant_id}',
-                'segment_id': segment_id,
-                'segment_name': segment_name,
-                'account_manager': np.random.choice(account_managers),
-                'contact_name': f"{np.random.choice(first_names)} {np.random.choice(last_names)}",
-                'contact_email': f"contact{merchant_id}@example.com",
-                'contact_phone': f"+1-555-{np.random.randint(100, 999)}-{np.random.randint(1000, 9999)}"
-            }
-            
-            # Assign an industry based on segment distribution
-            industry_items = list(industries.items())
-            industry_names = [item[0] for item in industry_items]
-            industry_weights = [item[1] for item in industry_items]
-            merchant['industry'] = np.random.choice(industry_names, p=industry_weights)
-            
-            # Generate volume data with some randomness
-            merchant['monthly_volume'] = int(np.random.normal(avg_volume, volume_std))
-            merchant['growth_rate'] = max(0, min(1, np.random.normal(avg_growth, growth_std)))
-            
-            # Determine feature adoption
-            merchant_features = {}
-            for feature in features:
-                # Probability of adoption based on segment characteristics
-                adoption_prob = feature_adoption.get(feature, 0.5)
-                merchant_features[feature] = np.random.random() < adoption_prob
-            
-            merchant['features'] = merchant_features
-            merchant['features_adopted'] = sum(merchant_features.values())
-            
-            # Add success metrics
-            merchant['tenure'] = np.random.randint(1, 48)  # 1-48 months
-            merchant['retention_probability'] = min(0.98, max(0.5, 
-                                                           0.75 + 
-                                                           0.05 * (merchant['features_adopted'] / len(features)) + 
-                                                           0.02 * (merchant['growth_rate'] * 10) +
-                                                           0.01 * (merchant['tenure'] / 12)))
-            
-            # Custom metrics for opportunity scoring
-            merchant['payment_success_rate'] = 0.95 + (0.04 * np.random.random())
-            merchant['average_order_frequency'] = np.random.randint(1, 12)  # Average orders per customer per year
+    Returns:
+        DataFrame: The block's merchants
+    """
+    segment, segment_index, block_index, first_id, count, seed, categories = task
+    streams = _block_streams(seed, segment_index, block_index)
+    return pd.DataFrame(_generate_segment_columns(segment, count, first_id, streams, categories))
+
+def _empty_merchant_frame(categories):
+    """Merchants frame with no rows but the generated columns and dtypes"""
+    columns = {'merchant_id': pd.Series([], dtype=str)}
+    for column in ['segment_id', 'segment_name', 'account_manager', 'industry']:
+        columns[column] = pd.Categorical([], dtype=categories[column])
+    for column in ['monthly_volume', 'growth_rate']:
+        columns[column] = np.empty(0, dtype=MERCHANT_DTYPES[column])
+    columns['feature_mask'] = pack_adoption(np.zeros((0, len(FEATURES)), dtype=bool))
+    for column in ['features_adopted', 'tenure', 'retention_probability', 'payment_success_rate',
+                   'average_order_frequency']:
+        columns[column] = np.empty(0, dtype=MERCHANT_DTYPES[column])
+    return pd.DataFrame(columns)
+
+def iter_merchant_batches(segments, num_merchants=None, batch_size=100_000, seed=42):
+    """
+    Stream mock merchant data in fixed-size DataFrame batches
+    
+    Only one batch is held in memory at a time, so arbitrarily large portfolios can
+    be processed. Batches contain every column of generate_merchants_by_segment()
+    except ``opportunity_score``, which is scaled over the whole population.
+    Concatenating all batches gives the same rows whatever ``batch_size`` is.
+    
+    Args:
+        segments (list): List of segment dictionaries from generate_merchant_segments()
+        num_merchants (int, optional): Total number of merchants to generate, split across
+            segments with allocate_segment_counts()
+        batch_size (int): Number of merchants per batch (the last batch may be smaller)
+        seed (int): Seed for the random generators
+        
+    Yields:
+        DataFrame: A batch of merchants, indexed by position in the full portfolio
+    """
+    counts = allocate_segment_counts(segments, num_merchants)
+    categories = merchant_categories(segments)
+    
+    pending = []
+    pending_rows = 0
+    batch_start = 0
+    
+    for segment_index, block_index, first_id, block_count in _segment_blocks(counts):
+        streams = _block_streams(seed, segment_index, block_index)
+        generated = 0
+        while generated < block_count:
+            # Fill the current batch, possibly spilling the block over several batches
+            take = min(block_count - generated, batch_size - pending_rows)
+            columns = _generate_segment_columns(segments[segment_index], take, first_id + generated, streams,
+                                                categories)
+            pending.append(pd.DataFrame(columns))
+            pending_rows += take
+            generated += take
             
-            merchants.append(merchant)
-            merchant_id += 1
+            if pending_rows == batch_size:
+                yield _assemble_batch(pending, batch_start)
+                batch_start += pending_rows
+                pending = []
+                pending_rows = 0
+    
+    if pending:
+        yield _assemble_batch(pending, batch_start)
+
+def _assemble_batch(frames, start):
+    """Concatenate batch pieces and index them by their position in the portfolio"""
+    batch = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    batch.index = pd.RangeIndex(start, start + len(batch))
+    return batch
+
+def generate_merchants_by_segment(segments, num_merchants=None, seed=42, workers=1):
+    """
+    Generate mock merchant data based on segments
     
-    # Convert to DataFrame
-    merchants_df = pd.DataFrame(merchants)
+    Each column of a segment is drawn with a single vectorized NumPy call and the
+    DataFrame is assembled directly from the resulting arrays, so millions of
+    merchants can be generated in seconds. Columns use the compact layout from
+    data.schema (categoricals and downcast numerics). With ``workers > 1`` the segment blocks
+    are fanned out across a process pool; the output is bit-identical to a
+    single-process run because every block has its own spawned seed.
+    
+    Args:
+        segments (list): List of segment dictionaries from generate_merchant_segments()
+        num_merchants (int, optional): Total number of merchants to generate, split across
+            segments in proportion to their merchant_count. Defaults to the sum of the
+            segments' merchant_count values.
+        seed (int): Seed for the random generators
+        workers (int): Number of worker processes to generate blocks with
+        
+    Returns:
+        DataFrame: Pandas DataFrame containing merchant data
+    """
+    counts = allocate_segment_counts(segments, num_merchants)
+    categories = merchant_categories(segments)
+    tasks = [(segments[segment_index], segment_index, block_index, first_id, block_count, seed, categories)
+             for segment_index, block_index, first_id, block_count in _segment_blocks(counts)]
+    
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_generate_block_frame, tasks))
+    else:
+        frames = [_generate_block_frame(task) for task in tasks]
+    
+    if not frames:
+        # No merchants to generate: same columns and dtypes, no rows
+        merchants_df = _empty_merchant_frame(categories)
+        merchants_df['opportunity_score'] = np.empty(0, dtype=MERCHANT_DTYPES['opportunity_score'])
+        return merchants_df
+    
+    merchants_df = pd.concat(frames, ignore_index=True)
     
     # Calculate the opportunity score - a combination of factors that indicate upsell potential
-    merchants_df['opportunity_score'] = (
-        # Higher volume means higher opportunity value
-        (merchants_df['monthly_volume'] / 10000) * 0.3 +
-        # Higher growth rate means higher potential
-        (merchants_df['growth_rate'] * 100) * 0.3 +
-        # More features adopted indicates receptiveness to new features
-        (merchants_df['features_adopted'] / len(features)) * 100 * 0.2 +
-        # Longer tenure means more stable relationship
-        (merchants_df['tenure'] / 48) * 100 * 0.1 +
-        # Higher retention probability means lower risk
-        (merchants_df['retention_probability'] * 100) * 0.1
-    )
-    
-    # Scale opportunity score to 0-100 range
-    min_score = merchants_df['opportunity_score'].min()
-    max_score = merchants_df['opportunity_score'].max()
-    merchants_df['opportunity_score'] = ((merchants_df['opportunity_score'] - min_score) / 
-                                       (max_score - min_score)) * 100
-    
-    # Round to integers
-    merchants_df['opportunity_score'] = merchants_df['opportunity_score'].astype(int)
+    # (see utils.scoring) - and scale it to 0-100 range
+    opportunity_score = OPPORTUNITY_PLAN.raw(merchants_df)
+    opportunity_score = OPPORTUNITY_PLAN.normalize(opportunity_score, OPPORTUNITY_PLAN.bounds(opportunity_score))
+    
+    # Truncate to whole points
+    merchants_df['opportunity_score'] = np.trunc(opportunity_score).astype(MERCHANT_DTYPES['opportunity_score'])
     
     return merchants_df
 
-def generate_feature_impact_data(features, segments):
+def generate_volume_history(merchants_df, segments, months=24, long_format=False, seed=42, chunk_size=BLOCK_SIZE):
     """
-    Generate data showing the impact of each feature on key merchant metrics
+    Generate an N-month payment volume history for every merchant
+    
+    Volumes are projected backwards from each merchant's current monthly_volume
+    using its annual growth_rate (compounded monthly) with log-normal noise scaled
+    by the segment's volume_volatility. Months before the merchant joined
+    (older than its tenure) are zero. The last month is the current snapshot.
+    The whole (merchants x months) matrix is computed with array operations,
+    in row chunks to bound temporary memory.
     
     Args:
-        features (list): List of feature names
-        segments (list): List of segment dictionaries
+        merchants_df (DataFrame): DataFrame containing merchant data
+        segments (list): List of segment dictionaries from generate_merchant_segments()
+        months (int): Number of months of history, ending with the current month
+        long_format (bool): Return a long DataFrame instead of the wide matrix
+        seed (int): Seed for the random generator
+        chunk_size (int): Number of merchants processed per chunk
         
     Returns:
-        DataFrame: Pandas DataFrame containing feature impact data
+        ndarray or DataFrame: float32 (merchants x months) matrix with the oldest
+        month first, or a long DataFrame with merchant_id, month (0 = current,
+        -1 = previous month, ...) and monthly_volume columns
     """
-    # Create dataframe showing the impact of each feature on key metrics
-    impact_data = []
+    rng = np.random.default_rng(seed)
     
-    for feature in features:
-        for segment in segments:
-            segment_id = segment['id']
-            segment_name = segment['name']
-            
-            # Base impact values
-            base_values = {
-                'volume_impact': np.random.uniform(0.05, 0.25),
-                'retention_impact': np.random.uniform(0.02, 0.15),
-                'growth_impact': np.random.uniform(0.03, 0.30)
-            }
-            
-            # Adjust based on the feature adoption - features with higher adoption in successful segments
-            # have higher impact
-            adoption_rate = segment['feature_adoption'].get(feature, 0.5)
-            impact_multiplier = 0.5 + adoption_rate
-            
-            # Create record for this feature-segment combination
-            impact_record = {
-                'feature': feature,
-                'segment_id': segment_id,
-                'segment_name': segment_name,
-                'volume_impact': base_values['volume_impact'] * impact_multiplier,
-                'retention_impact': base_values['retention_impact'] * impact_multiplier,
-                'growth_impact': base_values['growth_impact'] * impact_multiplier,
-                'adoption_rate': adoption_rate
-            }
-            
-            impact_data.append(impact_record)
+    volatility_by_segment = {segment['id']: segment.get('volume_volatility', 0.1) for segment in segments}
+    volatility = merchants_df['segment_id'].map(volatility_by_segment).to_numpy(dtype=np.float32)
+    monthly_growth = np.log1p(merchants_df['growth_rate'].to_numpy(dtype=np.float32)) / 12
+    current_volume = merchants_df['monthly_volume'].to_numpy(dtype=np.float32)
+    tenure = merchants_df['tenure'].to_numpy()
+    
+    # Months before the current one: months-1, ..., 1, 0
+    months_back = np.arange(months - 1, -1, -1, dtype=np.float32)
+    
+    history = np.empty((len(merchants_df), months), dtype=np.float32)
+    for start in range(0, len(merchants_df), chunk_size):
+        rows = slice(start, start + chunk_size)
+        sigma = volatility[rows, None]
+        
+        # Log-normal noise with mean 1; the current month is the known snapshot
+        noise = np.exp(sigma * rng.standard_normal((len(history[rows]), months), dtype=np.float32) - sigma ** 2 / 2)
+        noise[:, -1] = 1
+        
+        trend = np.exp(-monthly_growth[rows, None] * months_back)
+        history[rows] = np.clip(current_volume[rows, None] * trend * noise, 0, None)
+        
+        # Zero out the months before each merchant joined
+        history[rows][months_back >= tenure[rows, None]] = 0
     
-    return pd.DataFrame(impact_data)
+    if not long_format:
+        return history
+    
+    # merchant_id as a categorical over the (unique) ids avoids repeating every string
+    positions = np.repeat(np.arange(len(merchants_df)), months)
+    return pd.DataFrame({
+        'merchant_id': pd.Categorical.from_codes(positions, categories=merchants_df['merchant_id']),
+        'month': np.tile(-months_back.astype(np.int16), len(merchants_df)),
+        'monthly_volume': history.ravel(),
+    })
+
+def _opportunity_rows(merchants_df, feature, target_segment=None):
+    """Row positions of the merchants that have not adopted ``feature`` (optionally in one segment)"""
+    candidates = ~has_feature(merchants_df['feature_mask'], feature)
+    if target_segment:
+        candidates &= (merchants_df['segment_id'] == target_segment).to_numpy()
+    return np.flatnonzero(candidates)
 
-def generate_opportunity_recommendations(merchants_df, feature, target_segment=None):
+def count_opportunities(merchants_df, feature, target_segment=None, index=None):
     """
-    Generate a list of merchants who would benefit from adopting a specific feature
+    Number of merchants generate_opportunity_recommendations() can rank for a feature
     
     Args:
         merchants_df (DataFrame): DataFrame containing merchant data
         feature (str): Feature name to promote
         target_segment (str, optional): Segment ID to filter by
+        index (OpportunityIndex, optional): Prebuilt index of merchants_df
         
     Returns:
-        DataFrame: DataFrame containing recommended merchants sorted by opportunity score
+        int: Number of non-adopters of the feature
     """
-    # Filter by segment if specified
-    if target_segment:
-        merchants = merchants_df[merchants_df['segment_id'] == target_segment].copy()
-    else:
-        merchants = merchants_df.copy()
-    
-    # Filter merchants who don't have the feature yet
-    non_adopters = merchants[~merchants['features'].apply(lambda x: x.get(feature, False))].copy()
-    
-    if len(non_adopters) == 0:
-        return pd.DataFrame()
+    if index is not None:
+        return index.count(feature, target_segment)
+    return len(_opportunity_rows(merchants_df, feature, target_segment))
+
+def generate_opportunity_recommendations(merchants_df, feature, target_segment=None, k=10, page=0, index=None):
+    """
+    Generate a list of merchants who would benefit from adopting a specific feature
     
-    # Calculate opportunity score specific to this feature
-    # This simulates the model that would predict which merchants would benefit most
-    feature_opportunity_score = (
-        non_adopters['monthly_volume'] * 0.4 +
-        non_adopters['growth_rate'] * 100 * 0.3 +
-        non_adopters['retention_probability'] * 100 * 0.2 +
-        non_adopters['tenure'] * 0.1
-    )
+    Only the requested page is ranked: the best ``(page + 1) * k`` scores are
+    selected with an O(n) partial partition, so neither the merchants nor their
+    scores are copied and fully sorted for every page. Ties are broken by row
+    position, which keeps pages consistent with each other. With a prebuilt
+    utils.opportunity_index.OpportunityIndex the page is a slice of the stored
+    ranking instead.
     
-    # Scale to 0-100
-    min_score = feature_opportunity_score.min()
-    max_score = feature_opportunity_score.max()
-    if max_score > min_score:  # Avoid division by zero
-        feature_opportunity_score = ((feature_opportunity_score - min_score) / 
-                                    (max_score - min_score)) * 100
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        feature (str): Feature name to promote
+        target_segment (str, optional): Segment ID to filter by
+        k (int): Number of merchants per page
+        page (int): Zero-based page of the ranking to return
+        index (OpportunityIndex, optional): Prebuilt index of merchants_df
+        
+    Returns:
+        DataFrame: DataFrame containing recommended merchants sorted by opportunity score
+    """
+    # Fail on an unknown feature before any merchant is scanned
+    FEATURE_OPPORTUNITY_PLAN.variant(feature)
     
-    non_adopters['feature_opportunity_score'] = feature_opportunity_score.astype(int)
+    if index is not None:
+        if index.num_rows != len(merchants_df):
+            raise ValueError("The opportunity index was built for a different merchants_df")
+        # Non-adopters already sorted best first: the page is a slice
+        ranking = index.ranking(feature, target_segment)
+        start = page * k
+        if start >= len(ranking) or k <= 0:
+            return pd.DataFrame()
+        page_rows = ranking[start:start + k]
+        page_score = FEATURE_OPPORTUNITY_PLAN.raw(merchants_df, page_rows, feature)
+        bounds = index.bounds(feature, target_segment)
+    else:
+        # Merchants who don't have the feature yet, in the target segment if specified
+        rows = _opportunity_rows(merchants_df, feature, target_segment)
+        
+        start = page * k
+        if start >= len(rows) or k <= 0:
+            return pd.DataFrame()
+        stop = min(start + k, len(rows))
+        
+        # Calculate opportunity score specific to this feature
+        raw_score = FEATURE_OPPORTUNITY_PLAN.raw(merchants_df, rows, feature)
+        
+        # Partition out the best `stop` scores (plus any ties with the last one), then
+        # sort just those by score (descending) and position
+        threshold = np.partition(raw_score, len(raw_score) - stop)[len(raw_score) - stop]
+        candidates = np.flatnonzero(raw_score >= threshold)
+        ranked = candidates[np.lexsort((candidates, -raw_score[candidates]))][start:stop]
+        page_rows = rows[ranked]
+        page_score = raw_score[ranked]
+        bounds = FEATURE_OPPORTUNITY_PLAN.bounds(raw_score)
     
-    # Sort by opportunity score (descending)
-    recommended_merchants = non_adopters.sort_values('feature_opportunity_score', ascending=False)
+    # Scale to 0-100 over all non-adopters
+    page_score = FEATURE_OPPORTUNITY_PLAN.normalize(page_score, bounds)
     
-    # Include only relevant columns for display
+    # Include only relevant columns for display; contact details are derived for this page only
     display_cols = ['merchant_id', 'merchant_name', 'segment_name', 'industry', 
                    'monthly_volume', 'growth_rate', 'account_manager', 
                    'contact_name', 'feature_opportunity_score']
+    recommended_merchants = merchants_df.iloc[page_rows]
+    recommended_merchants = with_contact_info(recommended_merchants.assign(
+        feature_opportunity_score=page_score.astype(int)))
     
-    return recommended_merchants[display_cols].head(10)  # Return top 10 opportunities
\ No newline at end of file
+    return recommended_merchants[display_cols]
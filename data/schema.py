@@ -0,0 +1,105 @@
+import pandas as pd
+import numpy as np
+
+# Low-cardinality string columns, stored as categoricals (one small code per row)
+CATEGORICAL_COLUMNS = ['segment_id', 'segment_name', 'industry', 'account_manager']
+
+# Downcast numeric dtypes for merchants_df
+MERCHANT_DTYPES = {
+    'monthly_volume': np.int32,
+    'growth_rate': np.float32,
+    'features_adopted': np.int8,
+    'tenure': np.int8,  # 1-48 months
+    'retention_probability': np.float32,
+    'payment_success_rate': np.float32,
+    'average_order_frequency': np.int8,  # 1-12 orders per year
+    # 0-100 by default, but scoring definitions can set any range (or none), so it
+    # is stored as a float: an integer type would silently wrap out-of-range scores
+    'opportunity_score': np.float32,
+}
+
+def categorical_dtypes(categories):
+    """
+    Build fixed categorical dtypes from the known values of each column
+
+    Fixing the categories up front keeps codes consistent across generation
+    blocks and batches, so concatenating them stays categorical.
+
+    Args:
+        categories (dict): Column name to list of possible values
+
+    Returns:
+        dict: Column name to pandas CategoricalDtype
+    """
+    return {column: pd.CategoricalDtype(values) for column, values in categories.items()}
+
+def compact_merchants(merchants_df):
+    """
+    Convert a merchants DataFrame to the compact schema
+
+    Low-cardinality string columns become categoricals and numerics are downcast
+    to the dtypes in MERCHANT_DTYPES. Columns that are already compact or that
+    the schema does not cover are left untouched.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+
+    Returns:
+        DataFrame: Compact copy of the merchant data
+    """
+    conversions = {}
+    for column in CATEGORICAL_COLUMNS:
+        if column in merchants_df and not isinstance(merchants_df[column].dtype, pd.CategoricalDtype):
+            conversions[column] = 'category'
+    for column, dtype in MERCHANT_DTYPES.items():
+        if column in merchants_df and merchants_df[column].dtype != dtype:
+            conversions[column] = dtype
+    return merchants_df.astype(conversions)
+
+def wide_merchants(merchants_df):
+    """
+    Convert a merchants DataFrame back to the wide layout (strings, int64, float64)
+
+    Useful as the "before" side of memory_report() for a frame that was
+    generated compact.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+
+    Returns:
+        DataFrame: Copy with object strings and 64-bit numerics
+    """
+    conversions = {}
+    for column in CATEGORICAL_COLUMNS:
+        if column in merchants_df:
+            conversions[column] = object
+    for column, dtype in MERCHANT_DTYPES.items():
+        if column in merchants_df:
+            conversions[column] = np.int64 if np.issubdtype(dtype, np.integer) else np.float64
+    return merchants_df.astype(conversions)
+
+def memory_report(merchants_df, compact_df=None):
+    """
+    Per-column memory footprint before and after applying the compact schema
+
+    Args:
+        merchants_df (DataFrame): DataFrame with the original layout
+        compact_df (DataFrame, optional): Compact version of the same data.
+            Computed with compact_merchants() if not given.
+
+    Returns:
+        DataFrame: dtype and bytes before/after per column, plus a TOTAL row
+    """
+    if compact_df is None:
+        compact_df = compact_merchants(merchants_df)
+
+    report = pd.DataFrame({
+        'dtype_before': merchants_df.dtypes.astype(str),
+        'bytes_before': merchants_df.memory_usage(index=False, deep=True),
+        'dtype_after': compact_df.dtypes.astype(str),
+        'bytes_after': compact_df.memory_usage(index=False, deep=True),
+    })
+    report.loc['TOTAL'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+    report['saved_pct'] = (1 - report['bytes_after'] / report['bytes_before']) * 100
+
+    return report
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional: without it datasets are simply regenerated
+    pa = None
+
+from data.features import FEATURES
+from data.mock_data import generate_merchants_by_segment
+from utils.impact import compute_feature_impact
+from utils.scoring import scoring_definitions
+
+# Bump whenever the generators change what they produce for a given seed, so stale
+# snapshots are never reused
+SNAPSHOT_VERSION = 6
+
+# Where snapshots are written unless a directory is passed explicitly
+SNAPSHOT_DIR = Path(os.environ.get('GROWTH_FINDER_SNAPSHOT_DIR', Path(__file__).parent / 'snapshots'))
+
+def snapshot_key(segments, num_merchants=None, seed=42):
+    """
+    Hash of everything that determines a generated dataset
+
+    Args:
+        segments (list): List of segment dictionaries from generate_merchant_segments()
+        num_merchants (int, optional): Requested total number of merchants
+        seed (int): Seed used for generation
+
+    Returns:
+        str: Hex digest identifying the dataset
+    """
+    payload = json.dumps({
+        'version': SNAPSHOT_VERSION,
+        'segments': segments,
+        'features': FEATURES,
+        'scoring': scoring_definitions(),
+        'num_merchants': num_merchants,
+        'seed': seed,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+def save_snapshot(df, path):
+    """
+    Write a DataFrame to an uncompressed Arrow IPC file
+
+    The file is written next to its destination and renamed into place, so a
+    concurrent reader never sees a partially written snapshot.
+
+    Args:
+        df (DataFrame): Data to write
+        path (Path): Destination file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    with pa.OSFile(str(tmp_path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+def load_snapshot(path):
+    """
+    Memory-map an Arrow IPC snapshot and return it as a DataFrame
+
+    Args:
+        path (Path): Snapshot file written by save_snapshot()
+
+    Returns:
+        DataFrame: The snapshot's data, or None if the file does not exist
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    with pa.memory_map(str(path), 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+def load_or_generate_dataset(segments, num_merchants=None, seed=42, workers=1, snapshot_dir=None):
+    """
+    Load the merchants and feature impact tables from a snapshot, generating them on a miss
+
+    The feature impact table is measured from the generated merchants with
+    compute_feature_impact().
+
+    Snapshots are keyed by snapshot_key(), so changing the seed, the size or any
+    segment definition produces a new snapshot instead of reusing a stale one.
+    Without pyarrow installed this always generates.
+
+    Args:
+        segments (list): List of segment dictionaries from generate_merchant_segments()
+        num_merchants (int, optional): Total number of merchants to generate
+        seed (int): Seed for the random generators
+        workers (int): Number of worker processes for merchant generation
+        snapshot_dir (Path, optional): Snapshot directory. Defaults to SNAPSHOT_DIR.
+
+    Returns:
+        tuple: (merchants_df, feature_impact_df)
+    """
+    if pa is None:
+        merchants_df = generate_merchants_by_segment(segments, num_merchants, seed=seed, workers=workers)
+        return merchants_df, compute_feature_impact(merchants_df, segments)
+
+    snapshot_dir = Path(snapshot_dir or SNAPSHOT_DIR)
+    key = snapshot_key(segments, num_merchants, seed)
+    merchants_path = snapshot_dir / f'merchants-{key}.arrow'
+    impact_path = snapshot_dir / f'feature_impact-{key}.arrow'
+
+    merchants_df = load_snapshot(merchants_path)
+    feature_impact_df = load_snapshot(impact_path)
+
+    if merchants_df is None or feature_impact_df is None:
+        merchants_df = generate_merchants_by_segment(segments, num_merchants, seed=seed, workers=workers)
+        feature_impact_df = compute_feature_impact(merchants_df, segments)
+        save_snapshot(merchants_df, merchants_path)
+        save_snapshot(feature_impact_df, impact_path)
+
+    return merchants_df, feature_impact_df
@@ -0,0 +1,133 @@
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional: without it only CSV output is available
+    pa = None
+    pq = None
+
+from data.features import FEATURES
+
+# Spread of individual payment amounts around the segment's average transaction size
+AMOUNT_SIGMA = 0.6
+
+def iter_transaction_batches(merchants_df, segments, start_date, days=30, merchant_chunk=50_000, seed=42):
+    """
+    Stream individual payment events for a merchant portfolio, one day and merchant chunk at a time
+
+    Each merchant gets a Poisson number of payments per day so that its expected
+    monthly total matches monthly_volume at the segment's avg_transaction_size.
+    Every payment has a log-normal amount around that size, a success flag drawn
+    from the merchant's payment_success_rate, the feature it went through (one of
+    the merchant's adopted features, or none) and a customer from a pool sized by
+    the merchant's average_order_frequency.
+
+    Only one batch of events is in memory at a time. Every (day, chunk) pair has
+    its own spawned seed, so the events do not depend on how batches are consumed.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        segments (list): List of segment dictionaries from generate_merchant_segments()
+        start_date (str or date): First day to generate
+        days (int): Number of days to generate
+        merchant_chunk (int): Number of merchants per batch
+        seed (int): Seed for the random generators
+
+    Yields:
+        DataFrame: Payment events with merchant_id, timestamp, amount, feature,
+        success and customer_id columns, all on the same day
+    """
+    transaction_size = {segment['id']: segment['avg_transaction_size'] for segment in segments}
+    avg_size = merchants_df['segment_id'].map(transaction_size).to_numpy(dtype=np.float64)
+    daily_payments = np.clip(merchants_df['monthly_volume'].to_numpy(dtype=np.float64), 0, None) / avg_size / 30
+    success_rate = merchants_df['payment_success_rate'].to_numpy()
+    feature_mask = merchants_df['feature_mask'].to_numpy()
+
+    # Customers per merchant: yearly payments divided by orders per customer per year
+    customer_pool = np.maximum(1, daily_payments * 365 / merchants_df['average_order_frequency'].to_numpy())
+
+    merchant_ids = pd.Index(merchants_df['merchant_id'])
+    feature_dtype = pd.CategoricalDtype(FEATURES)
+    first_day = np.datetime64(pd.Timestamp(start_date).date(), 's')
+
+    for day in range(days):
+        day_start = first_day + np.timedelta64(day, 'D')
+        for chunk_index, start in enumerate(range(0, len(merchants_df), merchant_chunk)):
+            rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(day, chunk_index)))
+            rows = slice(start, start + merchant_chunk)
+
+            counts = rng.poisson(daily_payments[rows])
+            local_merchant = np.repeat(np.arange(len(counts)), counts)
+            merchant = start + local_merchant
+            num_events = len(merchant)
+
+            amount = avg_size[merchant] * np.exp(AMOUNT_SIGMA * rng.standard_normal(num_events) - AMOUNT_SIGMA ** 2 / 2)
+
+            # Pick a catalog feature per payment; it counts only if the merchant adopted it
+            feature = rng.integers(0, len(FEATURES), num_events)
+            used = (feature_mask[merchant] >> feature.astype(feature_mask.dtype)) & 1
+            feature_codes = np.where(used == 1, feature, -1)
+
+            yield pd.DataFrame({
+                # Categories limited to the chunk keep each written file's dictionary small
+                'merchant_id': pd.Categorical.from_codes(local_merchant, categories=merchant_ids[rows]),
+                'timestamp': day_start + rng.integers(0, 86_400, num_events).astype('timedelta64[s]'),
+                'amount': np.round(amount, 2),
+                'feature': pd.Categorical.from_codes(feature_codes, dtype=feature_dtype),
+                'success': rng.random(num_events) < success_rate[merchant],
+                'customer_id': (rng.random(num_events) * customer_pool[merchant]).astype(np.uint32),
+            })
+
+def write_partitioned_transactions(batches, output_dir, file_format='parquet'):
+    """
+    Write transaction batches to date-partitioned files
+
+    Files land in ``output_dir/date=YYYY-MM-DD/part-NNNNN.<ext>``, one file per
+    batch, so memory use stays at one batch regardless of the total volume.
+    Every partition this run writes to is replaced: its existing part files are
+    removed first, so writing the same events again does not duplicate them.
+    Partitions of other dates are left alone.
+
+    Args:
+        batches (iterable): DataFrames from iter_transaction_batches()
+        output_dir (str or Path): Root directory of the partitioned dataset
+        file_format (str): 'parquet' (requires pyarrow) or 'csv'
+
+    Returns:
+        dict: Number of events written per partition date
+    """
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"Unsupported file format: {file_format}")
+    if file_format == 'parquet' and pq is None:
+        raise ImportError("Writing Parquet requires pyarrow; use file_format='csv' instead")
+
+    output_dir = Path(output_dir)
+    events_per_date = {}
+    next_part = {}
+
+    for batch in batches:
+        if batch.empty:
+            continue
+        date = str(batch['timestamp'].iloc[0].date())
+        partition = output_dir / f'date={date}'
+        partition.mkdir(parents=True, exist_ok=True)
+
+        # First batch of the date in this run: replace the partition's previous parts
+        if date not in next_part:
+            for stale in partition.glob('part-*'):
+                stale.unlink()
+            next_part[date] = 0
+        path = partition / f'part-{next_part[date]:05d}.{file_format}'
+        next_part[date] += 1
+        if file_format == 'parquet':
+            pq.write_table(pa.Table.from_pandas(batch, preserve_index=False), path)
+        else:
+            batch.to_csv(path, index=False)
+
+        events_per_date[date] = events_per_date.get(date, 0) + len(batch)
+
+    return events_per_date
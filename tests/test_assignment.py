@@ -0,0 +1,30 @@
+import pandas as pd
+
+from utils.assignment import assign_opportunities
+
+def test_handoff_beats_weaker_own_lead():
+    # A owns a=100 and b=90, B owns c=10, one lead each: handing b to B
+    # (100 + 0.8 * 90 = 172) beats keeping c with its owner (100 + 10 = 110)
+    leads = pd.DataFrame({
+        'merchant_id': ['a', 'b', 'c'],
+        'account_manager': ['A', 'A', 'B'],
+        'feature_opportunity_score': [100, 90, 10],
+    })
+    assignments = assign_opportunities(leads, 1, managers=['A', 'B'], handoff_factor=0.8)
+
+    assigned = dict(zip(assignments['merchant_id'], assignments['assigned_manager']))
+    assert assigned == {'a': 'A', 'b': 'B'}
+    assert assignments['assigned_score'].sum() == 172
+    assert assignments.set_index('merchant_id')['reassigned'].to_dict() == {'a': False, 'b': True}
+
+def test_capacity_and_one_lead_per_merchant():
+    leads = pd.DataFrame({
+        'merchant_id': ['m1', 'm1', 'm2', 'm3', 'm4'],
+        'account_manager': ['A', 'A', 'A', 'B', 'B'],
+        'feature_opportunity_score': [50, 40, 30, 20, 10],
+    })
+    assignments = assign_opportunities(leads, {'A': 2, 'B': 1})
+
+    assert assignments['merchant_id'].is_unique
+    assert assignments['assigned_manager'].value_counts().to_dict() == {'A': 2, 'B': 1}
+    assert set(assignments['merchant_id']) == {'m1', 'm2', 'm3'}
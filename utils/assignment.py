@@ -0,0 +1,92 @@
+import heapq
+import itertools
+
+import pandas as pd
+import numpy as np
+
+# Share of a lead's score credited when it goes to a manager other than the merchant's own
+HANDOFF_FACTOR = 0.8
+
+def assign_opportunities(leads_df, capacity, score_column='feature_opportunity_score', managers=None,
+                         one_per_merchant=True, handoff_factor=HANDOFF_FACTOR):
+    """
+    Distribute ranked leads across account managers under per-manager capacity limits
+
+    Every (lead, manager) pair is an edge worth the lead's score when the manager
+    owns the merchant and ``handoff_factor`` of it for any other manager. Edges
+    are taken best first while the lead is unassigned and the manager has
+    capacity left (greedy weighted matching), so a manager's weaker own lead
+    never blocks a stronger lead handed off from a busier colleague. A lead's
+    handoff edges are all worth the same, so each lead has just two: its own
+    manager's, and one to whichever other manager has the most spare capacity.
+    Both edge lists are already sorted with the leads, so a heap merge walks
+    them best first and stops as soon as every manager is full.
+
+    Args:
+        leads_df (DataFrame): Leads with merchant_id, account_manager and a score
+            column, e.g. from generate_opportunity_recommendations() or utils.export
+        capacity (int or dict): Leads per manager, or manager name to capacity
+        score_column (str): Column to rank leads by
+        managers (list, optional): Managers to assign to. Defaults to the capacity
+            dict's keys, or the managers appearing in the leads.
+        one_per_merchant (bool): Keep only each merchant's best lead
+        handoff_factor (float): Share of the score credited for a reassigned
+            lead, between 0 and 1
+
+    Returns:
+        DataFrame: Assigned leads with assigned_manager, queue_position (0 = first
+        call), reassigned and assigned_score columns, ordered by manager and queue
+    """
+    if not 0 <= handoff_factor <= 1:
+        raise ValueError("handoff_factor must be between 0 and 1")
+    if managers is None:
+        managers = list(capacity) if isinstance(capacity, dict) else list(pd.unique(leads_df['account_manager']))
+    capacities = capacity if isinstance(capacity, dict) else dict.fromkeys(managers, capacity)
+    capacity_of = np.array([capacities.get(manager, 0) for manager in managers], dtype=np.int64)
+
+    # Row positions of the leads, best first (stable, so ties keep their input order)
+    positions = np.argsort(-leads_df[score_column].to_numpy(), kind='stable')
+    if one_per_merchant:
+        merchant_codes = pd.factorize(leads_df['merchant_id'])[0][positions]
+        positions = positions[np.sort(np.unique(merchant_codes, return_index=True)[1])]
+    scores = leads_df[score_column].to_numpy().astype(np.float64)[positions]
+    owner = pd.Categorical(leads_df['account_manager'], categories=managers).codes[positions].astype(np.int64)
+
+    # Edges (value, is_handoff, lead): own edges first on equal value
+    own_leads = np.flatnonzero(owner >= 0)
+    own_edges = zip(scores[own_leads].tolist(), itertools.repeat(False), own_leads.tolist())
+    handoff_edges = zip((scores * handoff_factor).tolist(), itertools.repeat(True), range(len(positions)))
+    edges = heapq.merge(own_edges, handoff_edges, key=lambda edge: (edge[0], not edge[1]), reverse=True)
+
+    spare = capacity_of.tolist()
+    remaining = sum(spare)
+    owners = owner.tolist()
+    assigned = [-1] * len(positions)
+    for _, is_handoff, lead in edges:
+        if remaining <= 0:
+            break
+        if assigned[lead] >= 0:
+            continue
+        if is_handoff:
+            manager = max((m for m in range(len(managers)) if m != owners[lead] and spare[m] > 0),
+                          key=spare.__getitem__, default=-1)
+        else:
+            manager = owners[lead] if spare[owners[lead]] > 0 else -1
+        if manager >= 0:
+            assigned[lead] = manager
+            spare[manager] -= 1
+            remaining -= 1
+    assigned_manager = np.array(assigned, dtype=np.int64)
+    own = assigned_manager == owner
+
+    taken = assigned_manager >= 0
+    assignments = leads_df.iloc[positions[taken]].copy()
+    assignments['assigned_manager'] = pd.Categorical.from_codes(assigned_manager[taken], categories=managers)
+    assignments['reassigned'] = ~own[taken]
+    assignments['assigned_score'] = np.where(assignments['reassigned'], handoff_factor, 1.0) * \
+        assignments[score_column].to_numpy()
+
+    # Queues: own leads first, then handoffs, each best first
+    assignments = assignments.sort_values(['assigned_manager', 'reassigned'], kind='stable')
+    assignments['queue_position'] = assignments.groupby('assigned_manager', observed=True).cumcount()
+    return assignments
@@ -0,0 +1,207 @@
+import functools
+import hashlib
+import inspect
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow is optional: without it string columns are hashed by pandas
+    pa = None
+
+# Default bounds of the shared result cache
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 256 * 2 ** 20
+
+def _size_of(value):
+    """Approximate memory footprint of a cached value in bytes"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size_of(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_size_of(item) for item in value)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by entry count and total bytes
+
+    One instance can be shared by every Streamlit session of the process. Values
+    larger than the whole byte budget are returned to the caller but not stored.
+
+    Args:
+        max_entries (int): Maximum number of cached values
+        max_bytes (int): Maximum total size of the cached values
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Look a key up, marking it as recently used
+
+        Returns:
+            tuple: (found, value)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries to stay within bounds"""
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry (the counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Cache counters for sizing the cache
+
+        Returns:
+            dict: hits, misses, evictions, entries, bytes and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+# Fingerprints of live DataFrames, so each dataset is hashed once
+_fingerprints = {}
+
+def dataset_fingerprint(df):
+    """
+    Content hash of a DataFrame, computed once per DataFrame object
+
+    Args:
+        df (DataFrame): Dataset to fingerprint
+
+    Returns:
+        str: Hex digest of the columns' names, dtypes and values
+    """
+    cached = _fingerprints.get(id(df))
+    if cached is not None and cached[0]() is df:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    digest.update(str(len(df)).encode())
+    for column in df.columns:
+        values = df[column]
+        digest.update(f'{column}:{values.dtype}'.encode())
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            digest.update(str(list(values.cat.categories)).encode())
+            digest.update(np.ascontiguousarray(values.cat.codes.to_numpy()).data)
+        elif pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+            digest.update(np.ascontiguousarray(values.to_numpy()).data)
+        elif pa is not None and hasattr(values.array, '__arrow_array__'):
+            # Arrow-backed strings: hash the buffers directly (zero-copy), plus the
+            # slice they describe since a slice shares its parent's buffers
+            array = pa.array(values.array)
+            chunks = array.chunks if isinstance(array, pa.ChunkedArray) else [array]
+            for chunk in chunks:
+                digest.update(f'{chunk.offset}:{len(chunk)}'.encode())
+                for buffer in chunk.buffers():
+                    if buffer is not None:
+                        digest.update(memoryview(buffer))
+        else:
+            digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().data)
+    fingerprint = digest.hexdigest()[:20]
+
+    key = id(df)
+    _fingerprints[key] = (weakref.ref(df, lambda _: _fingerprints.pop(key, None)), fingerprint)
+    return fingerprint
+
+def _frozen(value):
+    """Hashable stand-in for an argument value (lists and dicts become tuples, sets frozensets)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_frozen(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _frozen(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    return value
+
+def memoize(cache, ignore=()):
+    """
+    Cache a function whose first argument is a merchants DataFrame
+
+    Results are keyed by the function, the DataFrame's dataset_fingerprint() and
+    the other arguments (defaults included), so any change to the data or the
+    parameters is a different entry. Cached results are shared between callers:
+    treat them as read-only.
+
+    Args:
+        cache (LRUCache): Cache to store results in
+        ignore (tuple): Argument names left out of the key, e.g. helper objects
+            derived from the same data
+
+    Returns:
+        callable: Decorator
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        dataset_argument = next(iter(signature.parameters))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = tuple((name, _frozen(value)) for name, value in bound.arguments.items()
+                           if name != dataset_argument and name not in ignore)
+            key = (func.__module__, func.__qualname__, dataset_fingerprint(bound.arguments[dataset_argument]), params)
+
+            found, result = cache.get(key)
+            if not found:
+                result = func(*args, **kwargs)
+                cache.put(key, result)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+# Result cache shared by every session of the app process
+RESULT_CACHE = LRUCache()
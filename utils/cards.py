@@ -0,0 +1,208 @@
+import html
+import string
+
+import pandas as pd
+import numpy as np
+
+from data.features import FEATURES, adopted_feature_names
+
+def _compile(template):
+    """
+    Turn a template with named fields into a positional str.format
+
+    Args:
+        template (str): HTML with {field} / {field:spec} placeholders
+
+    Returns:
+        tuple: (format function taking one value per field, field names in order)
+    """
+    parts, fields = [], []
+    for literal, field, spec, _ in string.Formatter().parse(template):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is not None:
+            parts.append('{%d%s}' % (len(fields), ':' + spec if spec else ''))
+            fields.append(field)
+    return ''.join(parts).format, fields
+
+# Card templates, compiled once. They contain no blank lines, so the joined cards
+# stay a single raw HTML block for st.markdown.
+MERCHANT_CARD = _compile("""<div class="pixel-card">
+<div class="pixel-card-title">{merchant_name}</div>
+<div class="pixel-card-content">
+<div><strong>Industry:</strong> {industry}</div>
+<div><strong>Monthly Volume:</strong> ${monthly_volume:,}</div>
+<div><strong>Growth Rate:</strong> {growth_pct:.1f}%</div>
+<div><strong>Account Manager:</strong> {account_manager}</div>
+<div><strong>Features Adopted:</strong> {features_adopted} of {feature_count}</div>
+<div style="margin-top: 10px;">{badges}</div>
+</div>
+</div>""")
+
+OPPORTUNITY_CARD = _compile("""<div class="pixel-card" style="display: flex; align-items: center;">
+<div style="flex: 1;">
+<div class="pixel-card-title">{merchant_name}</div>
+<div class="pixel-card-content">
+<div><strong>Segment:</strong> {segment_name}</div>
+<div><strong>Industry:</strong> {industry}</div>
+<div><strong>Monthly Volume:</strong> ${monthly_volume:,}</div>
+<div><strong>Growth Rate:</strong> {growth_pct:.1f}%</div>
+<div><strong>Account Manager:</strong> {account_manager}</div>
+<div><strong>Contact:</strong> {contact_name}</div>
+<div><strong>Similar {feature} users:</strong> {similar}</div>
+</div>
+</div>
+<div style="width: 100px; text-align: center; padding: 10px;">
+<div style="font-family: 'VT323', monospace; font-size: 1rem; color: var(--light); margin-bottom: 5px;">OPPORTUNITY</div>
+<div style="font-family: 'Press Start 2P', cursive; font-size: 1.8rem; color: {score_color};">{score}</div>
+</div>
+</div>""")
+
+TOP_PERFORMER_CARD = _compile("""<div class="pixel-card">
+<div style="display: flex; align-items: center; margin-bottom: 10px;">
+<div style="flex: 1;">
+<div class="pixel-card-title">{merchant_name}</div>
+</div>
+<div style="width: 80px; text-align: center;">
+<div style="font-family: 'VT323', monospace; font-size: 0.9rem; color: var(--light);">SCORE</div>
+<div class="opportunity-score">{score}</div>
+</div>
+</div>
+<div class="pixel-card-content">
+<div><strong>Industry:</strong> {industry}</div>
+<div><strong>Monthly Volume:</strong> ${monthly_volume:,}</div>
+<div><strong>Growth Rate:</strong> {growth_pct:.1f}%</div>
+<div><strong>Features Adopted:</strong> {features_adopted} of {feature_count}</div>
+<div style="margin-top: 10px;">{badges}</div>
+</div>
+</div>""")
+
+# Opportunity score color bands: (lowest score, CSS color), best first, and the color below them
+SCORE_COLORS = [(80, 'var(--tertiary)'), (50, 'var(--warning)')]
+LOW_SCORE_COLOR = 'var(--danger)'
+
+def _escaped(values):
+    """HTML-escaped text of every value"""
+    return [html.escape(str(value)) for value in values]
+
+def feature_badges(masks, features=FEATURES):
+    """
+    Feature badge HTML for every adoption mask
+
+    Badges are built once per distinct mask and looked up for the rest, so a
+    page of cards only formats a handful of badge strings.
+
+    Args:
+        masks (array-like): Bitmask per merchant
+        features (list): Feature catalog the masks were packed with
+
+    Returns:
+        ndarray: Badge HTML per mask
+    """
+    codes, distinct = pd.factorize(np.asarray(masks))
+    badges = np.array([' '.join(f'<span class="feature-badge">{html.escape(feature)}</span>'
+                                for feature in adopted_feature_names(mask, features)) for mask in distinct],
+                      dtype=object)
+    return badges[codes] if len(distinct) else np.empty(0, dtype=object)
+
+def render_cards(card, columns):
+    """
+    Fill a compiled card template for every row and join the cards
+
+    Args:
+        card (tuple): Template from _compile()
+        columns (dict): Field name -> sequence of values (one per card) or a
+            scalar shared by every card; text must already be escaped
+
+    Returns:
+        str: HTML of all the cards, for a single st.markdown call
+    """
+    fill, fields = card
+    num_cards = max((len(values) for values in columns.values() if np.ndim(values)), default=0)
+    values = [columns[field] if np.ndim(columns[field]) else [columns[field]] * num_cards for field in fields]
+    return '\n'.join(map(fill, *[list(column) for column in values]))
+
+def merchant_cards(merchants_df, features=FEATURES):
+    """
+    Merchant example cards
+
+    Args:
+        merchants_df (DataFrame): Merchants with their contact columns (see with_contact_info())
+        features (list): Feature catalog the adoption masks were packed with
+
+    Returns:
+        str: HTML of one card per merchant
+    """
+    return render_cards(MERCHANT_CARD, {
+        'merchant_name': _escaped(merchants_df['merchant_name']),
+        'industry': _escaped(merchants_df['industry']),
+        'monthly_volume': merchants_df['monthly_volume'].tolist(),
+        'growth_pct': (merchants_df['growth_rate'] * 100).tolist(),
+        'account_manager': _escaped(merchants_df['account_manager']),
+        'features_adopted': merchants_df['features_adopted'].tolist(),
+        'feature_count': len(features),
+        'badges': feature_badges(merchants_df['feature_mask'], features),
+    })
+
+def opportunity_cards(opportunities, feature, similar_adopters=None):
+    """
+    Opportunity cards with their score and similar adopters of the feature
+
+    Args:
+        opportunities (DataFrame): Recommendations with their contact columns,
+            from generate_opportunity_recommendations()
+        feature (str): Recommended feature
+        similar_adopters (DataFrame, optional): Result of
+            SimilarMerchantIndex.similar_adopters() for these merchants
+
+    Returns:
+        str: HTML of one card per opportunity
+    """
+    scores = opportunities['feature_opportunity_score'].to_numpy()
+    score_colors = np.select([scores >= low for low, _ in SCORE_COLORS], [color for _, color in SCORE_COLORS],
+                             default=LOW_SCORE_COLOR)
+
+    # Every merchant's similar adopters as one line, nearest first
+    similar = ['None yet'] * len(opportunities)
+    if similar_adopters is not None and not similar_adopters.empty:
+        entries = pd.Series([f'{name} ({growth * 100:.1f}% growth)' for name, growth in
+                             zip(_escaped(similar_adopters['merchant_name']), similar_adopters['growth_rate'])],
+                            index=similar_adopters['similar_to'].to_numpy(), dtype=object)
+        joined = entries.groupby(level=0, sort=False).agg(', '.join)
+        similar = joined.reindex(opportunities['merchant_id'].to_numpy()).fillna('None yet').tolist()
+
+    return render_cards(OPPORTUNITY_CARD, {
+        'merchant_name': _escaped(opportunities['merchant_name']),
+        'segment_name': _escaped(opportunities['segment_name']),
+        'industry': _escaped(opportunities['industry']),
+        'monthly_volume': opportunities['monthly_volume'].tolist(),
+        'growth_pct': (opportunities['growth_rate'] * 100).tolist(),
+        'account_manager': _escaped(opportunities['account_manager']),
+        'contact_name': _escaped(opportunities['contact_name']),
+        'feature': html.escape(feature),
+        'similar': similar,
+        'score_color': score_colors,
+        'score': scores.tolist(),
+    })
+
+def top_performer_cards(examples, features=FEATURES):
+    """
+    Top performer cards with their success score
+
+    Args:
+        examples (DataFrame): Top examples of success_profiles() with their
+            contact columns
+        features (list): Feature catalog the adoption masks were packed with
+
+    Returns:
+        str: HTML of one card per merchant
+    """
+    return render_cards(TOP_PERFORMER_CARD, {
+        'merchant_name': _escaped(examples['merchant_name']),
+        'score': examples['success_score'].astype(int).tolist(),
+        'industry': _escaped(examples['industry']),
+        'monthly_volume': examples['monthly_volume'].tolist(),
+        'growth_pct': (examples['growth_rate'] * 100).tolist(),
+        'features_adopted': examples['features_adopted'].tolist(),
+        'feature_count': len(features),
+        'badges': feature_badges(examples['feature_mask'], features),
+    })
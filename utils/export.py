@@ -0,0 +1,193 @@
+import argparse
+import io
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional: without it only CSV output is available
+    pa = None
+    pq = None
+
+from data.contacts import contact_info
+from data.features import FEATURES, adoption_matrix
+from data.mock_data import BLOCK_SIZE
+from utils.scoring import FEATURE_OPPORTUNITY_PLAN
+from utils.sketches import QuantileSketch
+
+# Columns of every exported opportunity row
+EXPORT_COLUMNS = ['merchant_id', 'merchant_name', 'segment_id', 'segment_name', 'industry', 'feature',
+                  'feature_opportunity_score', 'monthly_volume', 'growth_rate', 'account_manager',
+                  'contact_name', 'contact_email', 'contact_phone']
+
+# Largest portfolio exported in memory for a download button; larger ones stream
+# to a file with the command line export (python -m utils.export)
+MAX_DOWNLOAD_MERCHANTS = 100_000
+
+def _feature_bounds(merchants_df, features, plan, chunk_size):
+    """Normalization bounds of every feature's non-adopter scores, sketched chunk by chunk"""
+    plan_columns = [plan.features.index(feature) for feature in features]
+    sketches = [QuantileSketch() for _ in features]
+    for start in range(0, len(merchants_df), chunk_size):
+        rows = np.arange(start, min(start + chunk_size, len(merchants_df)))
+        raw_scores = plan.raw_matrix(merchants_df, rows)[:, plan_columns]
+        adopted = adoption_matrix(merchants_df['feature_mask'].to_numpy()[rows], features)
+        for j, sketch in enumerate(sketches):
+            sketch.update(raw_scores[~adopted[:, j], j])
+    return [plan.bounds(sketch) for sketch in sketches]
+
+def iter_opportunity_chunks(merchants_df, features=FEATURES, plan=FEATURE_OPPORTUNITY_PLAN, chunk_size=BLOCK_SIZE):
+    """
+    Stream every (merchant, feature not yet adopted) opportunity in chunks
+
+    Scores are the portfolio-wide feature opportunity scores that
+    generate_opportunity_recommendations() ranks by. A first pass sketches each
+    feature's score bounds, the second emits one DataFrame per merchant chunk,
+    with contact details derived only for the exported rows.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        features (list): Feature catalog the adoption masks were packed with
+        plan (ScoringPlan): Feature opportunity scoring plan
+        chunk_size (int): Number of merchants per chunk
+
+    Yields:
+        DataFrame: Opportunity rows with the EXPORT_COLUMNS, merchant by merchant
+    """
+    bounds = _feature_bounds(merchants_df, features, plan, chunk_size)
+    plan_columns = [plan.features.index(feature) for feature in features]
+    feature_dtype = pd.CategoricalDtype(features)
+
+    for start in range(0, len(merchants_df), chunk_size):
+        chunk = merchants_df.iloc[start:start + chunk_size]
+        raw_scores = plan.raw_matrix(chunk)[:, plan_columns]
+        adopted = adoption_matrix(chunk['feature_mask'], features)
+
+        scores = np.empty(raw_scores.shape)
+        for j in range(len(features)):
+            scores[:, j] = plan.normalize(raw_scores[:, j], bounds[j])
+
+        # One row per (merchant, feature) the merchant has not adopted
+        rows, feature_codes = np.nonzero(~adopted)
+        merchants = chunk.iloc[rows]
+        contacts = contact_info(merchants['merchant_id']).reset_index(drop=True)
+        yield pd.DataFrame({
+            'merchant_id': merchants['merchant_id'].array,
+            'merchant_name': contacts['merchant_name'].array,
+            'segment_id': merchants['segment_id'].array,
+            'segment_name': merchants['segment_name'].array,
+            'industry': merchants['industry'].array,
+            'feature': pd.Categorical.from_codes(feature_codes, dtype=feature_dtype),
+            'feature_opportunity_score': scores[rows, feature_codes].astype(int),
+            'monthly_volume': merchants['monthly_volume'].array,
+            'growth_rate': merchants['growth_rate'].array,
+            'account_manager': merchants['account_manager'].array,
+            'contact_name': contacts['contact_name'].array,
+            'contact_email': contacts['contact_email'].array,
+            'contact_phone': contacts['contact_phone'].array,
+        })
+
+def write_opportunities(chunks, destination, file_format='csv'):
+    """
+    Write opportunity chunks to one CSV or Parquet file, one chunk at a time
+
+    Args:
+        chunks (iterable): DataFrames from iter_opportunity_chunks()
+        destination (str, Path or file-like): Output file or binary buffer
+        file_format (str): 'csv' or 'parquet' (requires pyarrow)
+
+    Returns:
+        int: Number of opportunity rows written
+    """
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"Unsupported file format: {file_format}")
+    if file_format == 'parquet' and pq is None:
+        raise ImportError("Writing Parquet requires pyarrow; use file_format='csv' instead")
+
+    if isinstance(destination, (str, Path)):
+        with open(destination, 'wb') as f:
+            return write_opportunities(chunks, f, file_format)
+
+    rows_written = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            if file_format == 'parquet':
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(destination, table.schema)
+                writer.write_table(table)
+            else:
+                chunk.to_csv(destination, header=rows_written == 0, index=False)
+            rows_written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows_written
+
+def export_opportunities(merchants_df, destination, file_format=None, chunk_size=BLOCK_SIZE):
+    """
+    Export every opportunity of a portfolio to CSV or Parquet
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        destination (str, Path or file-like): Output file or binary buffer
+        file_format (str, optional): 'csv' or 'parquet'. Defaults to the file's
+            suffix, or CSV for buffers.
+        chunk_size (int): Number of merchants per chunk
+
+    Returns:
+        int: Number of opportunity rows written
+    """
+    if file_format is None:
+        suffix = Path(destination).suffix.lstrip('.') if isinstance(destination, (str, Path)) else ''
+        file_format = 'parquet' if suffix == 'parquet' else 'csv'
+    return write_opportunities(iter_opportunity_chunks(merchants_df, chunk_size=chunk_size), destination,
+                               file_format)
+
+def opportunities_csv(merchants_df, max_merchants=MAX_DOWNLOAD_MERCHANTS):
+    """
+    All opportunities of a portfolio as CSV bytes (for download buttons)
+
+    A download has to be held in memory whole, so portfolios above
+    ``max_merchants`` are refused; export those to a file with
+    export_opportunities() or the command line instead.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        max_merchants (int): Largest portfolio exported in memory
+
+    Returns:
+        bytes: CSV with the EXPORT_COLUMNS
+    """
+    if len(merchants_df) > max_merchants:
+        raise ValueError(f"{len(merchants_df):,} merchants is too many to export in memory "
+                         f"(limit {max_merchants:,}); use python -m utils.export OUTPUT instead")
+    buffer = io.BytesIO()
+    export_opportunities(merchants_df, buffer, 'csv')
+    return buffer.getvalue()
+
+def main(argv=None):
+    """Command line entry point: python -m utils.export OUTPUT [options]"""
+    from data.mock_data import generate_merchant_segments
+    from data.snapshot import load_or_generate_dataset
+
+    parser = argparse.ArgumentParser(description="Export every merchant x feature opportunity to CSV or Parquet")
+    parser.add_argument('output', help="Output file (.csv or .parquet)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], help="Output format (default: from the file suffix)")
+    parser.add_argument('--num-merchants', type=int, help="Portfolio size (default: the segments' merchant counts)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed of the generated portfolio")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for portfolio generation")
+    parser.add_argument('--chunk-size', type=int, default=BLOCK_SIZE, help="Merchants per export chunk")
+    args = parser.parse_args(argv)
+
+    segments = generate_merchant_segments()
+    merchants_df, _ = load_or_generate_dataset(segments, args.num_merchants, seed=args.seed, workers=args.workers)
+    rows_written = export_opportunities(merchants_df, args.output, args.format, args.chunk_size)
+    print(f"Wrote {rows_written:,} opportunities for {len(merchants_df):,} merchants to {args.output}")
+
+if __name__ == '__main__':
+    main()
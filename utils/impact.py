@@ -0,0 +1,225 @@
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from data.features import FEATURES, adoption_matrix
+
+# Merchant metrics the impact of a feature is measured on, and the output column for each
+IMPACT_METRICS = {
+    'volume_impact': 'monthly_volume',
+    'growth_impact': 'growth_rate',
+    'retention_impact': 'retention_probability',
+}
+
+# Bootstrap replicates drawn per seed; fixed so results do not depend on the worker count
+BOOTSTRAP_CHUNK = 25
+
+# Merchants resampled at a time within a bootstrap chunk
+BOOTSTRAP_BLOCK = 65_536
+
+def _segment_groups(merchants_df, segments):
+    """
+    Row positions of each segment's merchants
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        segments (list): List of segment dictionaries
+
+    Returns:
+        list: One array of row positions per segment, in segment order
+    """
+    segment_ids = [segment['id'] for segment in segments]
+    codes = pd.Categorical(merchants_df['segment_id'], categories=segment_ids).codes
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(segment_ids) + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(len(segment_ids))]
+
+def _weighted_sums(adoption, values, weights=None):
+    """
+    Adopter and overall weighted sums of [count, metric...] for every feature at once
+
+    Args:
+        adoption (ndarray): (merchants x features) 0/1 adoption matrix
+        values (ndarray): (merchants x k) matrix whose first column is all ones
+        weights (ndarray, optional): (merchants x replicates) bootstrap weights
+
+    Returns:
+        tuple: (adopter sums, overall sums), shaped (features x k) and (k,) without
+        weights, or (replicates x features x k) and (replicates x k) with weights
+    """
+    if weights is None:
+        return adoption.T @ values, values.sum(axis=0)
+    adopter_sums = np.stack([adoption.T @ (weights * values[:, k:k + 1]) for k in range(values.shape[1])], axis=-1)
+    return adopter_sums.transpose(1, 0, 2), weights.T @ values
+
+def _impacts(adopter_sums, total_sums):
+    """
+    Relative adopter-vs-non-adopter difference of each metric's mean
+
+    Args:
+        adopter_sums (ndarray): (..., features, 1 + metrics) adopter sums
+        total_sums (ndarray): (..., 1 + metrics) overall sums
+
+    Returns:
+        tuple: (impacts shaped (..., features, metrics), adoption rate shaped (..., features))
+    """
+    other_sums = total_sums[..., None, :] - adopter_sums
+    with np.errstate(invalid='ignore', divide='ignore'):
+        adopter_means = adopter_sums[..., 1:] / adopter_sums[..., :1]
+        other_means = other_sums[..., 1:] / other_sums[..., :1]
+        adoption_rate = adopter_sums[..., 0] / total_sums[..., None, 0]
+        return adopter_means / other_means - 1, adoption_rate
+
+def _standard_errors(adopter_sums, total_sums, adopter_squares, total_squares):
+    """
+    Standard error of each relative difference, by the delta method
+
+    The impact is the ratio of two independent sample means minus one, so its
+    standard error is |ratio| * sqrt((se_a / mean_a)**2 + (se_b / mean_b)**2),
+    each mean's standard error being its sample standard deviation / sqrt(n).
+
+    Args:
+        adopter_sums (ndarray): (features, 1 + metrics) adopter sums
+        total_sums (ndarray): (1 + metrics) overall sums
+        adopter_squares (ndarray): (features, metrics) adopter sums of squares
+        total_squares (ndarray): (metrics) overall sums of squares
+
+    Returns:
+        ndarray: (features, metrics) standard errors (NaN with fewer than two
+        adopters or non-adopters)
+    """
+    groups = []
+    for sums, squares in [(adopter_sums, adopter_squares),
+                          (total_sums[None, :] - adopter_sums, total_squares[None, :] - adopter_squares)]:
+        counts = sums[:, :1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums[:, 1:] / counts
+            variances = np.maximum(squares - counts * means ** 2, 0) / (counts - 1)
+            groups.append((means, variances / counts))
+    (adopter_means, adopter_var), (other_means, other_var) = groups
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = adopter_means / other_means
+        return np.abs(ratio) * np.sqrt(adopter_var / adopter_means ** 2 + other_var / other_means ** 2)
+
+# Segment rows, adoption matrix and metric values the bootstrap resamples, set once per
+# process by _init_bootstrap() so tasks only carry their seed and size
+_bootstrap_data = None
+
+def _init_bootstrap(groups, adoption, values):
+    """Make the bootstrap inputs available to _bootstrap_chunk() (process pool initializer)"""
+    global _bootstrap_data
+    _bootstrap_data = (groups, adoption, values)
+
+def _bootstrap_chunk(task):
+    """
+    Impacts for one chunk of Poisson bootstrap replicates (process pool entry point)
+
+    Rows are resampled in fixed-size blocks so the temporary weight matrices stay
+    small however large a segment is. The data comes from _init_bootstrap().
+
+    Args:
+        task (tuple): (seed, chunk_index, replicates)
+
+    Returns:
+        ndarray: (replicates x segments x features x metrics) impacts
+    """
+    groups, adoption, values = _bootstrap_data
+    seed, chunk_index, replicates = task
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+    results = []
+    for rows in groups:
+        adopter_sums = np.zeros((replicates, adoption.shape[1], values.shape[1]))
+        total_sums = np.zeros((replicates, values.shape[1]))
+        for start in range(0, len(rows), BOOTSTRAP_BLOCK):
+            block = rows[start:start + BOOTSTRAP_BLOCK]
+            weights = rng.poisson(1.0, (len(block), replicates)).astype(np.float64)
+            block_adopters, block_totals = _weighted_sums(adoption[block], values[block], weights)
+            adopter_sums += block_adopters
+            total_sums += block_totals
+        impacts, _ = _impacts(adopter_sums, total_sums)
+        results.append(impacts)
+    return np.stack(results, axis=1)
+
+def compute_feature_impact(merchants_df, segments, features=FEATURES, n_bootstrap=0, confidence=0.95,
+                           workers=1, seed=42):
+    """
+    Measure the impact of each feature on merchant metrics from the merchant data itself
+
+    For every (feature, segment) pair the impact on volume, growth and retention is
+    the relative difference between the mean of adopters and non-adopters. All
+    features and metrics are aggregated together: one matrix product of the
+    adoption matrix with the metrics (and their squares, for the delta-method
+    standard errors) per segment.
+
+    Optional Poisson bootstrap replicates give confidence intervals. They are drawn
+    in fixed-size chunks, each with its own spawned seed, and can be spread across
+    a process pool without changing the result.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        segments (list): List of segment dictionaries
+        features (list): Feature catalog the adoption masks were packed with
+        n_bootstrap (int): Number of bootstrap replicates (0 disables intervals)
+        confidence (float): Confidence level of the bootstrap intervals
+        workers (int): Number of worker processes for the bootstrap
+        seed (int): Seed for the bootstrap
+
+    Returns:
+        DataFrame: One row per (feature, segment) with volume_impact, retention_impact,
+        growth_impact, adoption_rate and adopters columns, each impact's standard
+        error as <impact>_se, plus <impact>_low and <impact>_high interval
+        columns when n_bootstrap > 0
+    """
+    groups = _segment_groups(merchants_df, segments)
+    adoption = adoption_matrix(merchants_df['feature_mask'], features).astype(np.float64)
+    values = np.column_stack([np.ones(len(merchants_df))] +
+                             [merchants_df[column].to_numpy(dtype=np.float64) for column in IMPACT_METRICS.values()])
+
+    # (segments x features x metrics) point estimates and their standard errors
+    impacts, standard_errors, adoption_rates, adopters = [], [], [], []
+    for rows in groups:
+        adopter_sums, total_sums = _weighted_sums(adoption[rows], values[rows])
+        adopter_squares, total_squares = _weighted_sums(adoption[rows], values[rows, 1:] ** 2)
+        segment_impacts, segment_adoption = _impacts(adopter_sums, total_sums)
+        impacts.append(segment_impacts)
+        standard_errors.append(_standard_errors(adopter_sums, total_sums, adopter_squares, total_squares))
+        adoption_rates.append(segment_adoption)
+        adopters.append(adopter_sums[:, 0])
+    impacts = np.stack(impacts)
+    standard_errors = np.stack(standard_errors)
+
+    # Rows ordered feature first, then segment
+    impact_df = pd.DataFrame({
+        'feature': np.repeat(features, len(segments)),
+        'segment_id': np.tile([segment['id'] for segment in segments], len(features)),
+        'segment_name': np.tile([segment['name'] for segment in segments], len(features)),
+        'adoption_rate': np.stack(adoption_rates).T.ravel(),
+        'adopters': np.stack(adopters).T.ravel().astype(np.int64),
+    })
+    for k, column in enumerate(IMPACT_METRICS):
+        impact_df[column] = impacts[:, :, k].T.ravel()
+    for k, column in enumerate(IMPACT_METRICS):
+        impact_df[f'{column}_se'] = standard_errors[:, :, k].T.ravel()
+
+    if n_bootstrap > 0:
+        # The arrays are sent once per worker process; tasks are just (seed, chunk, size)
+        tasks = [(seed, chunk_index, min(BOOTSTRAP_CHUNK, n_bootstrap - start))
+                 for chunk_index, start in enumerate(range(0, n_bootstrap, BOOTSTRAP_CHUNK))]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_bootstrap,
+                                     initargs=(groups, adoption, values)) as pool:
+                replicates = np.concatenate(list(pool.map(_bootstrap_chunk, tasks)))
+        else:
+            _init_bootstrap(groups, adoption, values)
+            try:
+                replicates = np.concatenate([_bootstrap_chunk(task) for task in tasks])
+            finally:
+                _init_bootstrap(None, None, None)
+
+        alpha = (1 - confidence) / 2
+        low, high = np.nanquantile(replicates, [alpha, 1 - alpha], axis=0)
+        for k, column in enumerate(IMPACT_METRICS):
+            impact_df[f'{column}_low'] = low[:, :, k].T.ravel()
+            impact_df[f'{column}_high'] = high[:, :, k].T.ravel()
+
+    return impact_df
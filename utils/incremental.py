@@ -0,0 +1,175 @@
+from bisect import bisect_left, insort
+
+import pandas as pd
+import numpy as np
+
+from data.features import FEATURES, count_features
+from utils.scoring import FEATURE_OPPORTUNITY_PLAN, OPPORTUNITY_PLAN
+
+# Columns an upserted merchant row must provide
+SCORING_COLUMNS = ['merchant_id', 'monthly_volume', 'growth_rate', 'feature_mask', 'tenure',
+                   'retention_probability']
+
+class IncrementalOpportunityScorer:
+    """
+    Opportunity scores and rankings maintained under merchant upserts and deletes
+
+    Keeps the portfolio opportunity_score ranking of every merchant and, per
+    feature, the feature opportunity ranking of its non-adopters as sorted lists
+    of (-raw score, merchant_id). Scores are stored unscaled: the scoring plan's
+    normalization is applied when a score is read, with bounds taken from the
+    current ranking (its ends for min-max, order statistics for percentile
+    normalization). An update therefore only moves the updated merchant's
+    entries, even when it shifts the scale bounds.
+
+    Scaled scores match generate_merchants_by_segment() and
+    generate_opportunity_recommendations(); ties are ordered by merchant_id.
+
+    Args:
+        features (list): Feature catalog the adoption masks were packed with
+        opportunity_plan (ScoringPlan): Portfolio opportunity scoring plan
+        feature_plan (ScoringPlan): Feature opportunity scoring plan
+    """
+
+    def __init__(self, features=FEATURES, opportunity_plan=OPPORTUNITY_PLAN, feature_plan=FEATURE_OPPORTUNITY_PLAN):
+        self.features = list(features)
+        self.opportunity_plan = opportunity_plan
+        self.feature_plan = feature_plan
+        self._merchants = {}  # merchant_id -> (opportunity raw, feature raws, feature_mask)
+        self._rankings = {feature: [] for feature in [None] + self.features}
+
+    @classmethod
+    def from_merchants(cls, merchants_df, features=FEATURES, opportunity_plan=OPPORTUNITY_PLAN,
+                       feature_plan=FEATURE_OPPORTUNITY_PLAN):
+        """
+        Build a scorer from a full merchant portfolio with one sort per ranking
+
+        Args:
+            merchants_df (DataFrame): DataFrame containing merchant data
+            features (list): Feature catalog the adoption masks were packed with
+            opportunity_plan (ScoringPlan): Portfolio opportunity scoring plan
+            feature_plan (ScoringPlan): Feature opportunity scoring plan
+
+        Returns:
+            IncrementalOpportunityScorer: Scorer holding every merchant
+        """
+        scorer = cls(features, opportunity_plan, feature_plan)
+        merchant_ids, opportunity, feature_scores, masks = scorer._score(merchants_df)
+        scorer._merchants = dict(zip(merchant_ids, zip(opportunity.tolist(), map(tuple, feature_scores.tolist()),
+                                                       masks.tolist())))
+        scorer._rankings[None] = sorted(zip((-opportunity).tolist(), merchant_ids))
+        for bit, feature in enumerate(scorer.features):
+            non_adopters = np.flatnonzero((masks >> bit) & 1 == 0)
+            scorer._rankings[feature] = sorted(zip((-feature_scores[non_adopters, bit]).tolist(),
+                                                   [merchant_ids[i] for i in non_adopters]))
+        return scorer
+
+    def _score(self, merchants_df):
+        """Raw scores of a batch of merchant rows, computed with array operations"""
+        missing = [column for column in SCORING_COLUMNS if column not in merchants_df]
+        if missing:
+            raise ValueError(f"Merchant rows are missing columns: {missing}")
+        # Always derived from the mask so an update cannot leave the count stale
+        merchants_df = merchants_df.assign(features_adopted=count_features(merchants_df['feature_mask'].to_numpy()))
+
+        opportunity = self.opportunity_plan.raw(merchants_df)
+        feature_scores = self.feature_plan.raw_matrix(merchants_df)[
+            :, [self.feature_plan.features.index(feature) for feature in self.features]]
+        masks = merchants_df['feature_mask'].to_numpy().astype(np.int64)
+        return merchants_df['merchant_id'].astype(str).tolist(), opportunity, feature_scores, masks
+
+    def _entries(self, opportunity, feature_scores, feature_mask):
+        """(ranking, raw score) of every ranking a merchant belongs to"""
+        return [(None, opportunity)] + [(feature, feature_scores[bit]) for bit, feature in enumerate(self.features)
+                                        if not (feature_mask >> bit) & 1]
+
+    def _remove(self, merchant_id):
+        """Drop a merchant and its entries from every ranking it is in"""
+        for feature, score in self._entries(*self._merchants.pop(merchant_id)):
+            ranking = self._rankings[feature]
+            del ranking[bisect_left(ranking, (-score, merchant_id))]
+
+    def upsert(self, merchants_df):
+        """
+        Insert new merchants or replace existing ones
+
+        Args:
+            merchants_df (DataFrame): Merchant rows with the SCORING_COLUMNS
+        """
+        merchant_ids, opportunity, feature_scores, masks = self._score(merchants_df)
+        for merchant_id, *merchant in zip(merchant_ids, opportunity.tolist(), map(tuple, feature_scores.tolist()),
+                                          masks.tolist()):
+            if merchant_id in self._merchants:
+                self._remove(merchant_id)
+            self._merchants[merchant_id] = tuple(merchant)
+            for feature, score in self._entries(*merchant):
+                insort(self._rankings[feature], (-score, merchant_id))
+
+    def delete(self, merchant_ids):
+        """
+        Remove merchants; unknown ids are ignored
+
+        Args:
+            merchant_ids (iterable): Merchant ids to remove
+        """
+        for merchant_id in merchant_ids:
+            if merchant_id in self._merchants:
+                self._remove(merchant_id)
+
+    def __len__(self):
+        return len(self._merchants)
+
+    def __contains__(self, merchant_id):
+        return merchant_id in self._merchants
+
+    def _quantile(self, ranking, q):
+        """Linearly interpolated quantile of a ranking's raw scores (like np.quantile)"""
+        position = (1 - q) * (len(ranking) - 1)  # the ranking is sorted best first
+        low, high = int(np.floor(position)), int(np.ceil(position))
+        return -(ranking[low][0] + (ranking[high][0] - ranking[low][0]) * (position - low))
+
+    def _scale(self, feature, raw_scores):
+        """Normalize raw scores against bounds read off the current ranking"""
+        ranking = self._rankings[feature]
+        plan = self.opportunity_plan if feature is None else self.feature_plan
+        if plan.normalization['method'] == 'percentile':
+            bounds = (self._quantile(ranking, plan.normalization['lower']),
+                      self._quantile(ranking, plan.normalization['upper']))
+        else:
+            bounds = (-ranking[-1][0], -ranking[0][0])
+        return plan.normalize(np.asarray(raw_scores, dtype=np.float64), bounds).astype(int)
+
+    def opportunity_score(self, merchant_id):
+        """
+        Current 0-100 opportunity_score of a merchant
+
+        Args:
+            merchant_id (str): Merchant to look up
+
+        Returns:
+            int: Score scaled over the current portfolio
+        """
+        return int(self._scale(None, [self._merchants[merchant_id][0]])[0])
+
+    def top(self, feature=None, k=10, page=0):
+        """
+        A page of the current ranking
+
+        Args:
+            feature (str, optional): Feature to rank non-adopters for. Defaults to the
+                portfolio opportunity_score ranking.
+            k (int): Number of merchants per page
+            page (int): Zero-based page of the ranking to return
+
+        Returns:
+            DataFrame: merchant_id and score columns, best first
+        """
+        entries = self._rankings[feature][page * k:(page + 1) * k]
+        score_column = 'opportunity_score' if feature is None else 'feature_opportunity_score'
+        if not entries:
+            return pd.DataFrame(columns=['merchant_id', score_column])
+        raw_scores = [-score for score, _ in entries]
+        return pd.DataFrame({
+            'merchant_id': [merchant_id for _, merchant_id in entries],
+            score_column: self._scale(feature, raw_scores),
+        })
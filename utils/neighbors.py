@@ -0,0 +1,173 @@
+import pandas as pd
+import numpy as np
+
+from data.contacts import contact_info
+from data.features import FEATURES, has_feature
+
+# Merchant attributes similarity is measured on, each standardized to zero mean and
+# unit variance. Volume comes first: adopters are sorted by it to prune the search.
+SIMILARITY_COLUMNS = ['monthly_volume', 'growth_rate', 'tenure', 'features_adopted']
+
+# Squared distance added between merchants of different segments (in squared standard
+# deviations), so neighbours come from the merchant's own segment unless none is close
+SEGMENT_PENALTY = 4.0
+
+# Adopters nearest in volume scored first to bound a query's search
+SEED_WIDTH = 64
+
+# Metrics reported for every similar merchant
+NEIGHBOR_COLUMNS = ['merchant_id', 'merchant_name', 'segment_name', 'industry', 'monthly_volume',
+                    'growth_rate', 'tenure', 'features_adopted']
+
+class SimilarMerchantIndex:
+    """
+    Nearest-neighbour search for merchants that already adopted a feature
+
+    Merchants are compared on their standardized SIMILARITY_COLUMNS (volume on a
+    log scale, so it does not dominate), with a penalty across segments. Each
+    feature's adopters are sorted once by segment and volume. A query first
+    scores the few adopters closest in volume, which bounds the distance of its
+    k-th neighbour; only adopters whose volume lies within that bound can be
+    closer, so just that slice is compared exactly, and other segments are
+    skipped once the bound is below the segment penalty. A top-N list of
+    recommendations against a million merchants takes a few milliseconds.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        features (list): Feature catalog the adoption masks were packed with
+        columns (list): Numeric columns to measure similarity on, the first
+            one being used for pruning
+        segment_penalty (float): Squared distance added across segments
+    """
+
+    def __init__(self, merchants_df, features=FEATURES, columns=SIMILARITY_COLUMNS, segment_penalty=SEGMENT_PENALTY):
+        self.merchants_df = merchants_df
+        self.features = list(features)
+        self.segment_penalty = segment_penalty
+
+        values = np.empty((len(merchants_df), len(columns)), dtype=np.float32)
+        for i, column in enumerate(columns):
+            column_values = merchants_df[column].to_numpy().astype(np.float64)
+            if column == 'monthly_volume':
+                column_values = np.sign(column_values) * np.log1p(np.abs(column_values))
+            spread = column_values.std()
+            values[:, i] = (column_values - column_values.mean()) / (spread if spread > 0 else 1)
+        self._values = values
+
+        segment_ids = merchants_df['segment_id'].astype('category')
+        self._segments = segment_ids.cat.codes.to_numpy()
+        self._num_segments = len(segment_ids.cat.categories)
+        self._positions = pd.Index(merchants_df['merchant_id'])
+        self._adopters = {}
+
+    def adopters(self, feature):
+        """
+        A feature's adopters, sorted by segment then by the first similarity column
+
+        Built on the first query for the feature and kept.
+
+        Returns:
+            tuple: (positions, values, segment_starts) with the sorted row
+            positions, their standardized values and the offset of every
+            segment's slice
+        """
+        if feature not in self._adopters:
+            rows = np.flatnonzero(has_feature(self.merchants_df['feature_mask'], feature, self.features))
+            rows = rows[np.lexsort((self._values[rows, 0], self._segments[rows]))]
+            segment_starts = np.searchsorted(self._segments[rows], np.arange(self._num_segments + 1))
+            self._adopters[feature] = (rows, self._values[rows], segment_starts)
+        return self._adopters[feature]
+
+    def _nearest_one(self, row, feature, k):
+        """Squared distances and row positions of one merchant's k nearest adopters"""
+        positions, values, segment_starts = self.adopters(feature)
+        point = self._values[row]
+        own_segment = self._segments[row]
+
+        best_distances = np.empty(0, dtype=np.float32)
+        best_positions = np.empty(0, dtype=np.int64)
+        for segment in [own_segment] + [s for s in range(self._num_segments) if s != own_segment]:
+            penalty = 0.0 if segment == own_segment else self.segment_penalty
+            start, stop = segment_starts[segment], segment_starts[segment + 1]
+            if start == stop or (len(best_distances) == k and best_distances[-1] <= penalty):
+                continue
+
+            # Bound the k-th distance with the adopters nearest in volume, widening
+            # the seed until the slice it leaves to compare is not much larger...
+            keys = values[start:stop, 0]
+            middle = np.searchsorted(keys, point[0])
+            width = max(k, SEED_WIDTH)
+            while True:
+                seed = values[start + max(0, middle - width):start + min(len(keys), middle + width)]
+                seed_distances = ((seed - point) ** 2).sum(axis=1) + penalty
+                bound = np.sort(np.concatenate([best_distances, seed_distances]))[:k][-1]
+
+                # ...then compare every adopter whose volume alone is within the bound
+                radius = np.sqrt(max(bound - penalty, 0))
+                low = start + np.searchsorted(keys, point[0] - radius, side='left')
+                high = start + np.searchsorted(keys, point[0] + radius, side='right')
+                if high - low <= 8 * width or 2 * width >= len(keys):
+                    break
+                width *= 4
+            distances = ((values[low:high] - point) ** 2).sum(axis=1) + penalty
+
+            candidates = np.concatenate([best_distances, distances])
+            candidate_positions = np.concatenate([best_positions, positions[low:high]])
+            order = np.argsort(candidates, kind='stable')[:k]
+            best_distances, best_positions = candidates[order], candidate_positions[order]
+
+        return best_distances, best_positions
+
+    def nearest(self, rows, feature, k=5):
+        """
+        The k adopters of a feature closest to each query merchant
+
+        Args:
+            rows (array-like): Row positions of the query merchants
+            feature (str): Feature the neighbours must have adopted
+            k (int): Neighbours per query
+
+        Returns:
+            tuple: (positions, distances), (queries x k) arrays of adopter row
+            positions and Euclidean distances, nearest first; positions are -1
+            and distances inf where there are fewer than k adopters
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        positions = np.full((len(rows), k), -1, dtype=np.int64)
+        distances = np.full((len(rows), k), np.inf, dtype=np.float32)
+        for i, row in enumerate(rows):
+            squared, found = self._nearest_one(row, feature, k)
+            positions[i, :len(found)] = found
+            distances[i, :len(found)] = np.sqrt(squared)
+        return positions, distances
+
+    def similar_adopters(self, merchant_ids, feature, k=5):
+        """
+        Merchants similar to each given merchant that already use a feature
+
+        Args:
+            merchant_ids (array-like): Merchants to find neighbours for, e.g. the
+                merchant_id column of generate_opportunity_recommendations()
+            feature (str): Feature the neighbours must have adopted
+            k (int): Neighbours per merchant
+
+        Returns:
+            DataFrame: One row per (merchant, neighbour) with the query's
+            merchant_id as 'similar_to', the neighbour's rank (0 = nearest), its
+            distance and the NEIGHBOR_COLUMNS metrics
+        """
+        rows = self._positions.get_indexer(merchant_ids)
+        if (rows < 0).any():
+            raise KeyError("Unknown merchant IDs")
+
+        positions, distances = self.nearest(rows, feature, k)
+        found = positions >= 0
+        query, rank = np.nonzero(found)
+
+        neighbors = self.merchants_df.iloc[positions[found]]
+        neighbors = neighbors.assign(merchant_name=contact_info(neighbors['merchant_id'])['merchant_name'])
+        neighbors = neighbors[NEIGHBOR_COLUMNS].reset_index(drop=True)
+        neighbors.insert(0, 'similar_to', np.asarray(merchant_ids)[query])
+        neighbors.insert(1, 'rank', rank)
+        neighbors.insert(2, 'distance', distances[found])
+        return neighbors
@@ -0,0 +1,92 @@
+import pandas as pd
+import numpy as np
+
+from data.features import FEATURES, adoption_matrix
+from data.mock_data import BLOCK_SIZE
+from utils.scoring import FEATURE_OPPORTUNITY_PLAN
+
+def opportunity_score_matrix(merchants_df, features=FEATURES, by_segment=False, plan=FEATURE_OPPORTUNITY_PLAN,
+                             chunk_size=BLOCK_SIZE):
+    """
+    Feature opportunity score of every merchant for every feature in one pass
+
+    Scores are the ones generate_opportunity_recommendations() ranks by: the raw
+    feature opportunity scores of all features come from one evaluation of the
+    scoring plan, then are normalized over each feature's non-adopters (within
+    the merchant's segment when ``by_segment`` is set). Already adopted features
+    are masked with NaN. The raw scores are evaluated in row chunks to bound
+    temporary memory.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        features (list): Feature catalog the adoption masks were packed with
+        by_segment (bool): Scale each feature within the merchant's segment instead
+            of over the whole portfolio
+        plan (ScoringPlan): Feature opportunity scoring plan
+        chunk_size (int): Number of merchants evaluated per chunk
+
+    Returns:
+        ndarray: float32 (merchants x features) scores, NaN where the feature is adopted
+    """
+    num_merchants = len(merchants_df)
+    adopted = adoption_matrix(merchants_df['feature_mask'], features)
+    plan_columns = [plan.features.index(feature) for feature in features]
+
+    raw_scores = np.empty((num_merchants, len(features)))
+    for start in range(0, num_merchants, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, num_merchants))
+        raw_scores[rows] = plan.raw_matrix(merchants_df, rows)[:, plan_columns]
+
+    if by_segment:
+        codes = merchants_df['segment_id'].astype('category').cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        splits = np.flatnonzero(np.diff(codes[order])) + 1
+        groups = np.split(order, splits)
+    else:
+        groups = [np.arange(num_merchants)]
+
+    # Normalize every (group, feature) over its non-adopters
+    scores = np.full((num_merchants, len(features)), np.nan, dtype=np.float32)
+    for group in groups:
+        for j in range(len(features)):
+            rows = group[~adopted[group, j]]
+            if len(rows):
+                feature_scores = raw_scores[rows, j]
+                scores[rows, j] = plan.normalize(feature_scores, plan.bounds(feature_scores))
+
+    return scores
+
+def next_best_features(merchants_df, features=FEATURES, top_n=3, by_segment=False, plan=FEATURE_OPPORTUNITY_PLAN):
+    """
+    Rank the features each merchant has not adopted yet by opportunity score
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        features (list): Feature catalog the adoption masks were packed with
+        top_n (int): Number of ranked features to return per merchant
+        by_segment (bool): Scale scores within each segment, see opportunity_score_matrix()
+        plan (ScoringPlan): Feature opportunity scoring plan
+
+    Returns:
+        DataFrame: One row per merchant with merchant_id, segment_id and, for rank
+        r = 1..top_n, next_best_feature_r (categorical, NaN once a merchant has no
+        features left) and next_best_score_r columns
+    """
+    scores = opportunity_score_matrix(merchants_df, features, by_segment, plan)
+    top_n = min(top_n, len(features))
+
+    # Best score first; ties keep catalog order and adopted features sort last
+    order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), axis=1, kind='stable')[:, :top_n]
+    ranked_scores = np.take_along_axis(scores, order, axis=1)
+
+    feature_dtype = pd.CategoricalDtype(features)
+    result = pd.DataFrame({
+        'merchant_id': merchants_df['merchant_id'].array,
+        'segment_id': merchants_df['segment_id'].array,
+    }, index=merchants_df.index)
+    for rank in range(top_n):
+        codes = np.where(np.isnan(ranked_scores[:, rank]), -1, order[:, rank])
+        result[f'next_best_feature_{rank + 1}'] = pd.Categorical.from_codes(codes, dtype=feature_dtype)
+        result[f'next_best_score_{rank + 1}'] = ranked_scores[:, rank]
+
+    return result
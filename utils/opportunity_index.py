@@ -0,0 +1,85 @@
+import numpy as np
+
+from data.features import FEATURES, has_feature
+from utils.scoring import FEATURE_OPPORTUNITY_PLAN
+
+class OpportunityIndex:
+    """
+    Non-adopter row positions of every feature, pre-sorted by feature opportunity score
+
+    Built once per dataset, it turns generate_opportunity_recommendations() into a
+    slice of a sorted array: no filtering, scoring or sorting per query. Rankings
+    are kept for the whole portfolio and, optionally, for every segment.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        features (list): Features to index, a subset of the FEATURES catalog the
+            adoption masks are packed with
+        by_segment (bool): Also keep a ranking per (feature, segment)
+        plan (ScoringPlan): Feature opportunity scoring plan to rank by
+    """
+
+    def __init__(self, merchants_df, features=FEATURES, by_segment=True, plan=FEATURE_OPPORTUNITY_PLAN):
+        self.num_rows = len(merchants_df)
+        self.features = list(features)
+        self._rankings = {}
+        self._bounds = {}
+
+        position_dtype = np.int32 if self.num_rows < 2 ** 31 else np.int64
+        segment_ids = merchants_df['segment_id'].astype('category')
+        segment_codes = segment_ids.cat.codes.to_numpy()
+
+        for feature in self.features:
+            rows = np.flatnonzero(~has_feature(merchants_df['feature_mask'], feature, FEATURES))
+
+            # Best score first; the stable sort breaks ties by row position
+            raw_score = plan.raw(merchants_df, rows, feature)
+            order = np.argsort(-raw_score, kind='stable')
+            ranked = rows[order].astype(position_dtype)
+            self._rankings[(feature, None)] = ranked
+            if len(rows):
+                self._bounds[(feature, None)] = plan.bounds(raw_score)
+
+            if by_segment:
+                sorted_score = raw_score[order]
+                # A stable split by segment keeps every segment's rows in score order
+                codes = segment_codes[ranked]
+                by_code = np.argsort(codes, kind='stable')
+                splits = np.searchsorted(codes[by_code], np.arange(len(segment_ids.cat.categories) + 1))
+                for code, segment_id in enumerate(segment_ids.cat.categories):
+                    positions = by_code[splits[code]:splits[code + 1]]
+                    self._rankings[(feature, segment_id)] = ranked[positions]
+                    if len(positions):
+                        self._bounds[(feature, segment_id)] = plan.bounds(sorted_score[positions])
+
+    def ranking(self, feature, target_segment=None):
+        """
+        Non-adopter row positions for a feature, best opportunity first
+
+        Args:
+            feature (str): Feature name to promote
+            target_segment (str, optional): Segment ID to filter by
+
+        Returns:
+            ndarray: Row positions into the indexed merchants_df
+        """
+        if (feature, target_segment) not in self._rankings:
+            raise KeyError(f"No ranking indexed for feature {feature!r} and segment {target_segment!r}")
+        return self._rankings[(feature, target_segment)]
+
+    def bounds(self, feature, target_segment=None):
+        """
+        Normalization bounds of a ranking's raw scores, from the scoring plan
+
+        Args:
+            feature (str): Feature name to promote
+            target_segment (str, optional): Segment ID to filter by
+
+        Returns:
+            tuple: (low, high)
+        """
+        return self._bounds[(feature, target_segment)]
+
+    def count(self, feature, target_segment=None):
+        """Number of non-adopters of a feature, optionally in one segment"""
+        return len(self.ranking(feature, target_segment))
@@ -0,0 +1,308 @@
+import pandas as pd
+import numpy as np
+
+from data.features import FEATURES, adoption_matrix
+from utils.sketches import DEFAULT_K, QuantileSketch
+
+# Share of a segment's merchants counted as top performers
+TOP_PERFORMER_SHARE = 0.2
+
+# Columns of the per-segment summary table
+SUMMARY_COLUMNS = ['segment_size', 'top_count', 'threshold', 'top_avg_volume', 'segment_avg_volume',
+                   'top_avg_growth', 'segment_avg_growth', 'top_avg_features', 'segment_avg_features',
+                   'low_adoption_count']
+
+def _group_sums(codes, num_groups, *weights):
+    """Per-group sums of each weights array (a bincount per array)"""
+    return np.stack([np.bincount(codes, weights=w, minlength=num_groups) for w in weights], axis=1)
+
+def is_low_adopter(features_adopted, top_avg_features):
+    """
+    Whether merchants use fewer features than their segment's average top performer
+
+    The one definition behind success_profiles()'s low_adoption_count and
+    low_adopters().
+
+    Args:
+        features_adopted (array-like): Features adopted per merchant
+        top_avg_features (array-like): Their segment's top_avg_features
+
+    Returns:
+        ndarray: Boolean flag per merchant (False where the average is NaN)
+    """
+    return np.asarray(features_adopted, dtype=np.float64) < np.asarray(top_avg_features, dtype=np.float64)
+
+def _segment_codes(merchants_df):
+    """Segment code per merchant and the segment ids in code order"""
+    segment_ids = merchants_df['segment_id'].astype('category')
+    return segment_ids.cat.codes.to_numpy().astype(np.int64), segment_ids.cat.categories
+
+def _success_scores(merchants_df, codes, maxima):
+    """Success score per merchant from its segment's (best volume, best growth) row of maxima"""
+    volume = merchants_df['monthly_volume'].to_numpy().astype(np.float64)
+    growth = merchants_df['growth_rate'].to_numpy().astype(np.float64)
+    return (volume / maxima[codes, 0] * 0.6 + growth / maxima[codes, 1] * 0.4) * 100
+
+def segment_maxima(batches):
+    """
+    Best volume and growth of every segment, batch by batch
+
+    The first pass behind top_performer_thresholds(), for portfolios that do not
+    fit in memory.
+
+    Args:
+        batches (iterable): Merchant DataFrames, e.g. from iter_merchant_batches()
+
+    Returns:
+        DataFrame: max_volume and max_growth indexed by segment_id
+    """
+    maxima = None
+    for batch in batches:
+        batch_maxima = pd.DataFrame({
+            'segment_id': batch['segment_id'].astype(str).to_numpy(),
+            'max_volume': batch['monthly_volume'].to_numpy().astype(np.float64),
+            'max_growth': batch['growth_rate'].to_numpy().astype(np.float64),
+        }).groupby('segment_id').max()
+        maxima = batch_maxima if maxima is None else pd.concat([maxima, batch_maxima]).groupby(level=0).max()
+    if maxima is None:
+        return pd.DataFrame({'max_volume': [], 'max_growth': []}, index=pd.Index([], name='segment_id'))
+    return maxima
+
+def top_performer_thresholds(batches, maxima, top_share=TOP_PERFORMER_SHARE, k=DEFAULT_K, seed=0):
+    """
+    Top performer thresholds of every segment, batch by batch
+
+    The second pass over a portfolio that does not fit in memory: each batch's
+    success scores (relative to the maxima of segment_maxima()) are sketched
+    per segment and merged into that segment's running sketch, whose
+    (1 - ``top_share``) quantile is the threshold. The result can be passed to
+    top_performers() or success_profiles() for any batch.
+
+    Args:
+        batches (iterable): The same merchant batches segment_maxima() was given
+        maxima (DataFrame): Result of segment_maxima()
+        top_share (float): Share of merchants counted as top performers
+        k (int): Sketch accuracy parameter
+        seed (int): Seed for the compaction offsets
+
+    Returns:
+        DataFrame: max_volume, max_growth and threshold indexed by segment_id
+    """
+    sketches = [QuantileSketch(k, seed) for _ in range(len(maxima))]
+    for batch_index, batch in enumerate(batches):
+        codes = maxima.index.get_indexer(batch['segment_id'].astype(str))
+        scores = _success_scores(batch, codes, maxima.to_numpy())
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(maxima) + 1))
+        for group in np.flatnonzero(np.diff(bounds)):
+            # Each (segment, batch) sketch has its own spawned seed, as in sketch_array()
+            batch_seed = np.random.SeedSequence(seed, spawn_key=(group, batch_index))
+            sketches[group].merge(QuantileSketch.from_array(scores[order[bounds[group]:bounds[group + 1]]], k,
+                                                            batch_seed))
+    return maxima.assign(threshold=[sketch.quantile(1 - top_share) for sketch in sketches])
+
+def top_performers(merchants_df, top_share=TOP_PERFORMER_SHARE, thresholds=None):
+    """
+    Success score of every merchant and whether it is a top performer of its segment
+
+    The score combines volume and growth, each relative to the best in the
+    merchant's segment; top performers are the merchants at or above their
+    segment's exact (1 - ``top_share``) score quantile. For a batch of a larger
+    portfolio, pass the portfolio's ``thresholds`` (see
+    top_performer_thresholds()) to score it against the whole portfolio instead.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        top_share (float): Share of merchants counted as top performers
+        thresholds (DataFrame, optional): Precomputed max_volume, max_growth and
+            threshold per segment_id, from top_performer_thresholds()
+
+    Returns:
+        tuple: (success_score, is_top, threshold, order, sizes) with the score
+        and top flag per merchant, the threshold per segment (NaN for segments
+        without merchants), the row positions stably sorted by segment and the
+        merchants per segment, segments in the order of the segment_id
+        categories; order and sizes let callers reuse the grouping
+    """
+    codes, categories = _segment_codes(merchants_df)
+    num_groups = len(categories)
+
+    # Rows grouped by segment (a stable sort of small integer codes)
+    order = np.argsort(codes, kind='stable')
+    sizes = np.bincount(codes, minlength=num_groups)
+
+    if thresholds is not None:
+        known = thresholds.reindex(categories)
+        success_score = _success_scores(merchants_df, codes, known[['max_volume', 'max_growth']].to_numpy())
+        threshold = known['threshold'].to_numpy().astype(np.float64)
+        threshold[sizes == 0] = np.nan
+        return success_score, success_score >= threshold[codes], threshold, order, sizes
+
+    volume = merchants_df['monthly_volume'].to_numpy().astype(np.float64)
+    growth = merchants_df['growth_rate'].to_numpy().astype(np.float64)
+    maxima = pd.DataFrame({'volume': volume, 'growth': growth}).groupby(codes).max() \
+        .reindex(range(num_groups)).to_numpy()
+    success_score = _success_scores(merchants_df, codes, maxima)
+
+    # A linear-time quantile of each segment's slice
+    starts = np.cumsum(sizes) - sizes
+    threshold = np.full(num_groups, np.nan)
+    for group in np.flatnonzero(sizes):
+        threshold[group] = np.quantile(success_score[order[starts[group]:starts[group] + sizes[group]]], 1 - top_share)
+    return success_score, success_score >= threshold[codes], threshold, order, sizes
+
+def success_profiles(merchants_df, top_share=TOP_PERFORMER_SHARE, examples=3, features=FEATURES, thresholds=None):
+    """
+    What sets every segment's most successful merchants apart, in one grouped pass
+
+    The top performers of every segment (see top_performers()) are compared with
+    the whole segment. All segments are profiled together: one stable sort by
+    segment (shared with top_performers()) gives each segment's slice for its quantile and examples
+    (linear-time partitions), and every mean, adoption rate and industry share
+    is a bincount over segment codes, so millions of merchants take a fraction
+    of a second.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        top_share (float): Share of merchants counted as top performers
+        examples (int): Number of example top performers per segment
+        features (list): Feature catalog the adoption masks were packed with
+        thresholds (DataFrame, optional): Portfolio-wide thresholds from
+            top_performer_thresholds(), when profiling one batch of it
+
+    Returns:
+        dict: Tables indexed by segment_id, for segment_profile() to look up:
+        'summary' (SUMMARY_COLUMNS), 'feature_comparison' (top_adoption,
+        avg_adoption, difference and lift per segment and feature),
+        'top_industries' (share of top performers per segment and industry,
+        top 3) and 'top_examples' (best merchants with their success_score)
+    """
+    segment_ids = merchants_df['segment_id'].astype('category')
+    codes = segment_ids.cat.codes.to_numpy().astype(np.int64)
+    num_groups = len(segment_ids.cat.categories)
+    volume = merchants_df['monthly_volume'].to_numpy().astype(np.float64)
+    growth = merchants_df['growth_rate'].to_numpy().astype(np.float64)
+    features_adopted = merchants_df['features_adopted'].to_numpy().astype(np.float64)
+    success_score, is_top, threshold, order, sizes = top_performers(merchants_df, top_share, thresholds)
+
+    # Each segment's best examples from its slice of the rows grouped by segment
+    starts = np.cumsum(sizes) - sizes
+    present = sizes > 0
+    example_rows = []
+    for group in np.flatnonzero(present):
+        rows = order[starts[group]:starts[group] + sizes[group]]
+        scores = success_score[rows]
+        # Best scores first, ties in row order
+        cut = max(len(scores) - examples, 0)
+        best = np.flatnonzero(scores >= np.partition(scores, cut)[cut])
+        example_rows.append(rows[best[np.lexsort((best, -scores[best]))][:examples]])
+
+    # Means of the segments and of their top performers
+    top_counts = np.bincount(codes, weights=is_top, minlength=num_groups).astype(np.int64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        segment_means = _group_sums(codes, num_groups, volume, growth, features_adopted) / sizes[:, None]
+        top_means = _group_sums(codes, num_groups, volume * is_top, growth * is_top,
+                                features_adopted * is_top) / top_counts[:, None]
+    low_adoption = np.bincount(codes, weights=is_low_adopter(features_adopted, top_means[codes, 2]),
+                               minlength=num_groups)
+
+    # Adoption rates from a (segment x distinct mask) count table
+    mask_codes, masks = pd.factorize(merchants_df['feature_mask'].to_numpy())
+    pair_codes = codes * len(masks) + mask_codes
+    mask_counts = np.bincount(pair_codes, minlength=num_groups * len(masks)).reshape(num_groups, len(masks))
+    top_mask_counts = np.bincount(pair_codes, weights=is_top, minlength=num_groups * len(masks)) \
+        .reshape(num_groups, len(masks))
+    mask_features = adoption_matrix(masks, features).astype(np.float64)
+
+    index = pd.Index(segment_ids.cat.categories[present], name='segment_id')
+    summary = pd.DataFrame({
+        'segment_size': sizes,
+        'top_count': top_counts,
+        'threshold': threshold,
+        'top_avg_volume': top_means[:, 0],
+        'segment_avg_volume': segment_means[:, 0],
+        'top_avg_growth': top_means[:, 1],
+        'segment_avg_growth': segment_means[:, 1],
+        'top_avg_features': top_means[:, 2],
+        'segment_avg_features': segment_means[:, 2],
+        # Merchants using fewer features than the average top performer (is_low_adopter())
+        'low_adoption_count': low_adoption.astype(np.int64),
+    })[present].set_axis(index)
+
+    top_adoption = (top_mask_counts @ mask_features)[present] / top_counts[present, None]
+    avg_adoption = (mask_counts @ mask_features)[present] / sizes[present, None]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lift = top_adoption / avg_adoption
+    feature_comparison = pd.DataFrame({
+        'feature': np.tile(features, len(index)),
+        'top_adoption': top_adoption.ravel(),
+        'avg_adoption': avg_adoption.ravel(),
+        'difference': (top_adoption - avg_adoption).ravel(),
+        'lift': lift.ravel(),
+    }, index=index.repeat(len(features)))
+
+    # Industry mix of the top performers: a (segment x industry) count table
+    industries = merchants_df['industry'].astype('category')
+    num_industries = len(industries.cat.categories)
+    industry_counts = np.bincount(codes * num_industries + industries.cat.codes.to_numpy(), weights=is_top,
+                                  minlength=num_groups * num_industries).reshape(num_groups, num_industries)[present]
+    best_industries = np.argsort(-industry_counts, axis=1, kind='stable')[:, :3]
+    best_counts = np.take_along_axis(industry_counts, best_industries, axis=1)
+    keep = best_counts > 0
+    top_industries = pd.Series(
+        (best_counts / top_counts[present][:, None])[keep],
+        index=pd.MultiIndex.from_arrays([index.repeat(best_industries.shape[1])[keep.ravel()],
+                                         industries.cat.categories[best_industries[keep]]],
+                                        names=['segment_id', 'industry']),
+        name='share')
+
+    example_rows = np.concatenate(example_rows) if example_rows else np.empty(0, dtype=np.int64)
+    top_examples = merchants_df.iloc[example_rows].assign(success_score=success_score[example_rows])
+
+    return {
+        'summary': summary,
+        'feature_comparison': feature_comparison,
+        'top_industries': top_industries,
+        'top_examples': top_examples,
+    }
+
+def segment_profile(profiles, segment_id):
+    """
+    One segment's view of success_profiles()
+
+    Args:
+        profiles (dict): Result of success_profiles()
+        segment_id (str): Segment to look up
+
+    Returns:
+        dict: The segment's SUMMARY_COLUMNS values plus its feature_comparison
+        DataFrame, top_industries Series and top_examples DataFrame; None for a
+        segment without merchants
+    """
+    if segment_id not in profiles['summary'].index:
+        return None
+
+    # Column by column, so the counts stay integers (a row would be upcast to float)
+    summary = profiles['summary']
+    profile = {column: summary.at[segment_id, column].item() for column in SUMMARY_COLUMNS}
+    profile['feature_comparison'] = profiles['feature_comparison'].loc[[segment_id]].reset_index(drop=True)
+    profile['top_industries'] = profiles['top_industries'].loc[segment_id]
+    examples = profiles['top_examples']
+    profile['top_examples'] = examples[examples['segment_id'] == segment_id]
+    return profile
+
+def low_adopters(merchants_df, profiles):
+    """
+    Merchants counted in their segment's low_adoption_count
+
+    Args:
+        merchants_df (DataFrame): Merchants of the profiled dataset (any subset)
+        profiles (dict): Result of success_profiles() for that dataset
+
+    Returns:
+        DataFrame: The rows of ``merchants_df`` that are low adopters
+    """
+    summary = profiles['summary']
+    segments = summary.index.get_indexer(merchants_df['segment_id'].astype(str))
+    top_avg_features = np.append(summary['top_avg_features'].to_numpy(), np.nan)[segments]
+    return merchants_df[is_low_adopter(merchants_df['features_adopted'].to_numpy(), top_avg_features)]
@@ -0,0 +1,151 @@
+import itertools
+
+import pandas as pd
+import numpy as np
+
+from data.features import FEATURES, count_features
+from utils.profiles import TOP_PERFORMER_SHARE, top_performers
+
+# Smallest share of a segment's merchants a feature combination must reach to be mined
+MIN_SUPPORT = 0.05
+
+# Largest feature combination mined (3 = pairs and triples)
+MAX_RECIPE_SIZE = 3
+
+# 64-bit words of itemset bitsets ANDed at a time (bounds memory)
+BITSET_BLOCK = 2 ** 22
+
+def _candidates(frequent, size):
+    """
+    Apriori join: itemsets of ``size`` whose every (size - 1)-subset is frequent
+
+    Args:
+        frequent (set): Frequent itemsets of size - 1, as sorted tuples of feature indices
+        size (int): Size of the candidates
+
+    Returns:
+        list: Candidate itemsets as sorted tuples
+    """
+    if size == 1:
+        return sorted(frequent)
+    prefixes = {}
+    for itemset in sorted(frequent):
+        prefixes.setdefault(itemset[:-1], []).append(itemset[-1])
+    candidates = []
+    for prefix, lasts in prefixes.items():
+        for a, b in itertools.combinations(lasts, 2):
+            candidate = prefix + (a, b)
+            if all(subset in frequent for subset in itertools.combinations(candidate, size - 1)):
+                candidates.append(candidate)
+    return candidates
+
+def _feature_bitsets(masks, groups, num_groups, num_features):
+    """
+    Adoption of every feature as a bitset over the merchants, grouped
+
+    Merchants are ordered by group and every group starts on a 64-bit word, so
+    a group's merchants are a contiguous run of words in every bitset.
+
+    Returns:
+        tuple: ((features x words) uint64 bitsets, first word of every group)
+    """
+    order = np.argsort(groups, kind='stable')
+    sizes = np.bincount(groups, minlength=num_groups)
+    words = -(-sizes // 64)
+    word_starts = np.cumsum(words) - words
+    # Bit position of every (grouped) merchant in the padded layout
+    bit_positions = np.arange(len(groups)) + np.repeat(word_starts * 64 - (np.cumsum(sizes) - sizes), sizes)
+
+    sorted_masks = np.asarray(masks)[order]
+    bitsets = np.zeros((num_features, max(words.sum(), 1)), dtype=np.uint64)
+    adopted = np.zeros(bitsets.shape[1] * 64, dtype=bool)
+    for feature in range(num_features):
+        adopted[bit_positions] = (sorted_masks >> feature) & 1
+        bitsets[feature] = np.packbits(adopted, bitorder='little').view(np.uint64)
+    return bitsets, word_starts
+
+def _itemset_counts(bitsets, word_starts, itemsets):
+    """Merchants of every group having all features of each itemset: bitwise AND, then popcount"""
+    itemsets = np.asarray(itemsets)
+    counts = np.empty((len(itemsets), len(word_starts)))
+    block = max(1, BITSET_BLOCK // bitsets.shape[1])
+    for start in range(0, len(itemsets), block):
+        chunk = itemsets[start:start + block]
+        combined = np.bitwise_and.reduce(bitsets[chunk], axis=1)
+        popcounts = count_features(combined.ravel()).reshape(combined.shape).astype(np.int64)
+        # Empty groups have no words; reduceat needs in-range starts
+        sums = np.add.reduceat(popcounts, np.minimum(word_starts, combined.shape[1] - 1), axis=1)
+        counts[start:start + block] = np.where(np.diff(np.append(word_starts, combined.shape[1])) > 0, sums, 0)
+    return counts
+
+def feature_recipes(merchants_df, top_share=TOP_PERFORMER_SHARE, min_support=MIN_SUPPORT,
+                    max_size=MAX_RECIPE_SIZE, features=FEATURES):
+    """
+    Support and top-performer lift of feature combinations, per segment
+
+    A recipe's support is the share of a segment's merchants using all of its
+    features, and its lift how much more common it is among the segment's top
+    performers (top_support / support). Each feature's adoption is packed into
+    a bitset over the merchants, grouped by segment and top-performer flag, so
+    counting an itemset in every group is a bitwise AND of a few bitsets and a
+    popcount, 64 merchants per operation and no loop over merchants.
+    Candidates are pruned apriori: a combination is only counted when all of
+    its sub-combinations reach ``min_support`` in some segment, which keeps
+    dozens of features tractable.
+
+    Args:
+        merchants_df (DataFrame): DataFrame containing merchant data
+        top_share (float): Share of each segment counted as top performers
+        min_support (float): Smallest support a recipe needs in its segment
+        max_size (int): Largest number of features in a recipe
+        features (list): Feature catalog the adoption masks were packed with
+
+    Returns:
+        DataFrame: Recipes of 2 to ``max_size`` features indexed by segment_id,
+        with features (tuple of names), size, merchants, support, top_support
+        and lift columns, best lift first within each segment
+    """
+    segment_ids = merchants_df['segment_id'].astype('category')
+    codes = segment_ids.cat.codes.to_numpy().astype(np.int64)
+    num_groups = len(segment_ids.cat.categories)
+    _, is_top, _, _, sizes = top_performers(merchants_df, top_share)
+
+    # Groups 0..G-1 are the segments' other merchants, G..2G-1 their top performers
+    bitsets, word_starts = _feature_bitsets(merchants_df['feature_mask'].to_numpy(), codes + num_groups * is_top,
+                                            2 * num_groups, len(features))
+    top_sizes = np.bincount(codes, weights=is_top, minlength=num_groups)
+    min_count = min_support * sizes
+
+    columns = ['segment_id', 'features', 'size', 'merchants', 'support', 'top_support', 'lift']
+    results = []
+    frequent = {(feature,) for feature in range(len(features))}
+    for size in range(1, max_size + 1):
+        candidates = _candidates(frequent, size)
+        if not candidates:
+            break
+        counts = _itemset_counts(bitsets, word_starts, candidates)
+        top_counts = counts[:, num_groups:]
+        segment_counts = counts[:, :num_groups] + top_counts
+
+        # Keep each segment's recipes with enough support (segments without merchants or top
+        # performers have none to measure); frequent anywhere seeds the next size
+        supported = (segment_counts >= min_count) & (sizes > 0) & (top_sizes > 0)
+        frequent = {candidate for candidate, keep in zip(candidates, supported.any(axis=1)) if keep}
+        if size == 1:
+            continue
+        itemset_index, group_index = np.nonzero(supported)
+        support = segment_counts[itemset_index, group_index] / sizes[group_index]
+        top_support = top_counts[itemset_index, group_index] / top_sizes[group_index]
+        results.append(pd.DataFrame({
+            'segment_id': segment_ids.cat.categories[group_index],
+            'features': [tuple(features[i] for i in candidates[c]) for c in itemset_index],
+            'size': size,
+            'merchants': segment_counts[itemset_index, group_index].astype(np.int64),
+            'support': support,
+            'top_support': top_support,
+            'lift': top_support / support,
+        }, columns=columns))
+
+    recipes = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=columns)
+    recipes = recipes.sort_values(['segment_id', 'lift'], ascending=[True, False], kind='stable')
+    return recipes.set_index('segment_id')
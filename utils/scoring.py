@@ -0,0 +1,257 @@
+import copy
+import json
+import os
+
+import numpy as np
+
+from data.features import FEATURES, has_feature
+from utils.sketches import DEFAULT_K, QuantileSketch
+
+# Opportunity score of a merchant: a combination of factors that indicate upsell potential.
+# Each term contributes weight * transform(column) * scale.
+OPPORTUNITY_SCORE = {
+    'terms': [
+        # Higher volume means higher opportunity value
+        {'column': 'monthly_volume', 'weight': 0.3, 'scale': 1 / 10000},
+        # Higher growth rate means higher potential
+        {'column': 'growth_rate', 'weight': 0.3, 'scale': 100},
+        # More features adopted indicates receptiveness to new features
+        {'column': 'features_adopted', 'weight': 0.2, 'scale': 100 / len(FEATURES)},
+        # Longer tenure means more stable relationship
+        {'column': 'tenure', 'weight': 0.1, 'scale': 100 / 48},
+        # Higher retention probability means lower risk
+        {'column': 'retention_probability', 'weight': 0.1, 'scale': 100},
+    ],
+    'normalization': {'method': 'minmax', 'range': [0, 100]},
+}
+
+# Opportunity of a merchant for a feature it has not adopted. This simulates the
+# model that would predict which merchants would benefit most.
+FEATURE_OPPORTUNITY_SCORE = {
+    'terms': [
+        {'column': 'monthly_volume', 'weight': 0.4},
+        {'column': 'growth_rate', 'weight': 0.3, 'scale': 100},
+        {'column': 'retention_probability', 'weight': 0.2, 'scale': 100},
+        {'column': 'tenure', 'weight': 0.1},
+    ],
+    'normalization': {'method': 'minmax', 'range': [0, 100]},
+    # Per-feature term changes, e.g.
+    # {'Subscription API': {'terms': [{'column': 'average_order_frequency', 'weight': 5}]}}
+    'feature_overrides': {},
+}
+
+# Optional JSON file overriding the definitions above, keyed by 'opportunity_score'
+# and/or 'feature_opportunity_score', so models can be changed without code changes
+SCORING_FILE = os.environ.get('GROWTH_FINDER_SCORING')
+
+# Element-wise transforms a term can apply to its column
+TRANSFORMS = {
+    'identity': lambda values: values,
+    'log1p': np.log1p,
+    'sqrt': np.sqrt,
+}
+
+# minmax scales [min, max] onto the range; percentile scales [lower, upper] quantiles
+# onto it and clips, so a few outliers cannot squash everyone else's scores
+NORMALIZATIONS = ['minmax', 'percentile', 'none']
+
+def _merge_terms(terms, overrides):
+    """Replace the terms an override redefines (same column and transform) and append new ones"""
+    merged = {(term['column'], term.get('transform', 'identity')): term for term in terms}
+    for term in overrides:
+        merged[(term['column'], term.get('transform', 'identity'))] = term
+    return list(merged.values())
+
+class ScoringPlan:
+    """
+    A scoring definition compiled into a vectorized evaluation plan
+
+    Compilation resolves every term (and every per-feature override) into one
+    coefficient matrix over the distinct transformed columns. Evaluating the
+    score of any number of merchants is then a column gather and a single matrix
+    product, with no per-row Python.
+
+    Args:
+        definition (dict): Scoring definition with 'terms', an optional
+            'normalization' and optional 'feature_overrides'
+        features (list): Feature catalog overrides may refer to
+    """
+
+    def __init__(self, definition, features=FEATURES):
+        self.definition = copy.deepcopy(definition)
+        self.features = list(features)
+
+        normalization = {'method': 'minmax', 'range': [0, 100], 'lower': 0.01, 'upper': 0.99}
+        normalization.update(self.definition.get('normalization', {}))
+        if normalization['method'] not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization: {normalization['method']}")
+        self.normalization = normalization
+
+        overrides = self.definition.get('feature_overrides', {})
+        unknown = set(overrides) - set(self.features)
+        if unknown:
+            raise ValueError(f"Overrides for unknown features: {sorted(unknown)}")
+
+        # Variant 0 is the base definition, variant 1 + i the definition for feature i
+        variants = [self.definition['terms']] + [
+            _merge_terms(self.definition['terms'], overrides.get(feature, {}).get('terms', []))
+            for feature in self.features]
+
+        self.inputs = []  # distinct (column, transform) pairs
+        for terms in variants:
+            for term in terms:
+                key = (term['column'], term.get('transform', 'identity'))
+                if key[1] not in TRANSFORMS:
+                    raise ValueError(f"Unknown transform: {key[1]}")
+                if key not in self.inputs:
+                    self.inputs.append(key)
+
+        self.weights = np.zeros((len(self.inputs), len(variants)))
+        for variant, terms in enumerate(variants):
+            for term in terms:
+                key = (term['column'], term.get('transform', 'identity'))
+                self.weights[self.inputs.index(key), variant] += term['weight'] * term.get('scale', 1)
+
+    def _design(self, merchants_df, rows=None):
+        """(rows x inputs) float64 matrix of the transformed input columns"""
+        num_rows = len(merchants_df) if rows is None else len(rows)
+        design = np.empty((num_rows, len(self.inputs)))
+        for i, (column, transform) in enumerate(self.inputs):
+            values = merchants_df[column].to_numpy()
+            if rows is not None:
+                values = values[rows]
+            design[:, i] = TRANSFORMS[transform](values.astype(np.float64))
+        return design
+
+    def variant(self, feature=None):
+        """
+        Weight column of the base definition (None) or of a feature's definition
+
+        A feature outside the plan's catalog raises a ValueError naming it.
+        """
+        if feature is None:
+            return 0
+        if feature not in self.features:
+            raise ValueError(f"Unknown feature {feature!r}; expected one of {self.features}")
+        return 1 + self.features.index(feature)
+
+    def raw(self, merchants_df, rows=None, feature=None):
+        """
+        Unnormalized scores
+
+        Args:
+            merchants_df (DataFrame): Merchant data
+            rows (ndarray, optional): Row positions to score. Defaults to every row.
+            feature (str, optional): Score with this feature's overrides applied
+
+        Returns:
+            ndarray: float64 score per row
+        """
+        return self._design(merchants_df, rows) @ self.weights[:, self.variant(feature)]
+
+    def raw_matrix(self, merchants_df, rows=None):
+        """
+        Unnormalized scores for every feature at once
+
+        Args:
+            merchants_df (DataFrame): Merchant data
+            rows (ndarray, optional): Row positions to score. Defaults to every row.
+
+        Returns:
+            ndarray: float64 (rows x features) scores
+        """
+        return self._design(merchants_df, rows) @ self.weights[:, 1:]
+
+    def bounds(self, raw_scores):
+        """
+        Reference bounds the normalization maps onto its output range
+
+        Args:
+            raw_scores (ndarray or QuantileSketch): Raw scores of the reference
+                population, or a sketch of them when they do not fit in memory
+
+        Returns:
+            tuple: (low, high)
+        """
+        if self.normalization['method'] == 'percentile':
+            quantiles = (self.normalization['lower'], self.normalization['upper'])
+            if isinstance(raw_scores, QuantileSketch):
+                return tuple(raw_scores.quantile(quantiles))
+            return tuple(np.quantile(raw_scores, quantiles))
+        if isinstance(raw_scores, QuantileSketch):
+            return raw_scores.min, raw_scores.max
+        return raw_scores.min(), raw_scores.max()
+
+    def streaming_bounds(self, batches, feature=None, k=DEFAULT_K):
+        """
+        Normalization bounds computed batch by batch, for portfolios that do not fit in memory
+
+        Args:
+            batches (iterable): Merchant DataFrames, e.g. from iter_merchant_batches()
+            feature (str, optional): Score with this feature's overrides, over its
+                non-adopters only
+            k (int): Sketch accuracy parameter
+
+        Returns:
+            tuple: (low, high)
+        """
+        sketch = QuantileSketch(k)
+        for batch in batches:
+            rows = None
+            if feature is not None:
+                rows = np.flatnonzero(~has_feature(batch['feature_mask'], feature, self.features))
+            sketch.update(self.raw(batch, rows, feature))
+        return self.bounds(sketch)
+
+    def normalize(self, raw_scores, bounds):
+        """
+        Map raw scores onto the output range
+
+        Scores are left unscaled when the bounds coincide (avoids division by zero)
+        or when the definition's normalization is 'none'. Percentile normalization
+        clips scores outside the bounds to the ends of the range.
+
+        Args:
+            raw_scores (ndarray): Raw scores to normalize
+            bounds (tuple): (low, high) from bounds()
+
+        Returns:
+            ndarray: Normalized scores
+        """
+        low, high = bounds
+        if self.normalization['method'] == 'none' or not high > low:
+            return raw_scores
+        range_low, range_high = self.normalization['range']
+        scores = (raw_scores - low) / (high - low) * (range_high - range_low) + range_low
+        if self.normalization['method'] == 'percentile':
+            scores = np.clip(scores, range_low, range_high)
+        return scores
+
+def scoring_definitions(path=SCORING_FILE):
+    """
+    Effective scoring definitions: the defaults, updated from a JSON file if given
+
+    Args:
+        path (str, optional): JSON file with 'opportunity_score' and/or
+            'feature_opportunity_score' definitions
+
+    Returns:
+        dict: 'opportunity_score' and 'feature_opportunity_score' definitions
+    """
+    definitions = {
+        'opportunity_score': OPPORTUNITY_SCORE,
+        'feature_opportunity_score': FEATURE_OPPORTUNITY_SCORE,
+    }
+    if path:
+        with open(path) as f:
+            custom = json.load(f)
+        unknown = set(custom) - set(definitions)
+        if unknown:
+            raise ValueError(f"Unknown scoring definitions: {sorted(unknown)}")
+        definitions.update(custom)
+    return copy.deepcopy(definitions)
+
+# Plans compiled once at import
+_definitions = scoring_definitions()
+OPPORTUNITY_PLAN = ScoringPlan(_definitions['opportunity_score'])
+FEATURE_OPPORTUNITY_PLAN = ScoringPlan(_definitions['feature_opportunity_score'])
@@ -0,0 +1,182 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Default sketch accuracy parameter: larger keeps more items and gives tighter quantiles
+DEFAULT_K = 256
+
+# Values sketched per task by sketch_array(); fixed so results do not depend on the worker count
+SKETCH_CHUNK = 1_000_000
+
+class QuantileSketch:
+    """
+    Mergeable streaming quantile sketch (KLL style)
+
+    Values are kept in levels of sorted compactors: an item at level h stands for
+    2**h values. When a level outgrows its capacity it is sorted and every other
+    item (from a random offset) is promoted to the next level, so memory stays
+    O(k log(n / k)) however many values are added. Sketches built on separate
+    chunks or workers can be merged into one. Until the first compaction the
+    sketch holds every value and quantiles are exact.
+
+    Args:
+        k (int): Capacity of the top level; rank error shrinks roughly as 1 / k
+        seed (int): Seed for the compaction offsets
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_array(cls, values, k=DEFAULT_K, seed=0):
+        """Sketch of an array of values"""
+        return cls(k, seed).update(values)
+
+    def _capacity(self, level):
+        """Capacity of a level: k at the top, shrinking by 2/3 per level below it"""
+        depth = len(self._levels) - 1 - level
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        """Compact levels until every level is within its capacity"""
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self._levels):
+                self._levels.append(np.empty(0))
+            items = np.sort(items)
+            # An odd item out stays behind; the rest are halved into the next level
+            leftover = items[len(items) - len(items) % 2:]
+            promoted = items[self._rng.integers(0, 2):len(items) - len(items) % 2:2]
+            self._levels[level] = leftover
+            self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            # Adding a level lowers the capacity of the ones below it
+            level = 0
+
+    def update(self, values):
+        """
+        Add a batch of values (NaNs are ignored)
+
+        Args:
+            values (array-like): Values to add
+
+        Returns:
+            QuantileSketch: self
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.count += len(values)
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self._levels[0] = np.concatenate([self._levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """
+        Fold another sketch into this one
+
+        Args:
+            other (QuantileSketch): Sketch of another part of the data
+
+        Returns:
+            QuantileSketch: self
+        """
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """
+        Approximate quantile(s) of the values added so far
+
+        While the sketch is still exact this matches numpy's default (linear)
+        quantile; afterwards it returns the item at the estimated rank.
+
+        Args:
+            q (float or array-like): Quantile(s) between 0 and 1
+
+        Returns:
+            float or ndarray: Quantile value(s), NaN for an empty sketch
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        if len(self._levels) == 1:
+            return np.quantile(self._levels[0], q)
+
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h) for h, level in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        ranks = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1], side='left')
+        result = items[order][np.clip(ranks, 0, len(items) - 1)]
+        # The exact extremes are tracked separately
+        return np.clip(result, self.min, self.max)
+
+    def __len__(self):
+        """Number of items the sketch currently stores"""
+        return sum(len(level) for level in self._levels)
+
+def _sketch_chunk(task):
+    """Sketch one chunk of an array (process pool entry point)"""
+    values, k, seed, chunk_index = task
+    return QuantileSketch.from_array(values, k, np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+
+def sketch_array(values, k=DEFAULT_K, seed=0, workers=1, chunk_size=SKETCH_CHUNK):
+    """
+    Sketch an array in fixed-size chunks, optionally across a process pool
+
+    Every chunk has its own spawned seed and the chunk sketches are merged in
+    order, so the result does not depend on the worker count.
+
+    Args:
+        values (array-like): Values to sketch
+        k (int): Sketch accuracy parameter
+        seed (int): Seed for the compaction offsets
+        workers (int): Number of worker processes
+        chunk_size (int): Number of values per chunk
+
+    Returns:
+        QuantileSketch: Sketch of all the values
+    """
+    values = np.asarray(values)
+    tasks = [(values[start:start + chunk_size], k, seed, chunk_index)
+             for chunk_index, start in enumerate(range(0, len(values), chunk_size))]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            sketches = list(pool.map(_sketch_chunk, tasks))
+    else:
+        sketches = [_sketch_chunk(task) for task in tasks]
+    return merge_sketches(sketches, k, seed)
+
+def merge_sketches(sketches, k=DEFAULT_K, seed=0):
+    """
+    Merge sketches built on separate parts of the data, in order
+
+    Args:
+        sketches (iterable): QuantileSketch objects
+        k (int): Accuracy parameter of the merged sketch
+        seed (int): Seed for the merged sketch's compaction offsets
+
+    Returns:
+        QuantileSketch: Sketch of all the parts
+    """
+    merged = QuantileSketch(k, seed)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged